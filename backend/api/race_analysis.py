@@ -3,8 +3,8 @@ Race Analysis API endpoints
 Handles saving and retrieving race performance analysis data
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import date, datetime
@@ -12,23 +12,24 @@ from decimal import Decimal
 import json
 import logging
 
-from database import get_db_connection
+from database import get_db_cursor
 from models import User
-from auth import auth_manager
+from auth import auth_manager, bearer_token
 from exceptions import AuthenticationError
 
-# Security scheme for JWT
-security = HTTPBearer()
-
 # Logger
 logger = logging.getLogger(__name__)
 
 # Authentication dependency
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+async def get_current_user(request: Request) -> User:
     """Get current authenticated user from JWT token"""
+    token = bearer_token(request.headers.get("Authorization"))
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
     try:
-        token = credentials.credentials
-        user = auth_manager.get_current_user(token)
+        user = auth_manager.get_cached_user(token)
+        if user is None:
+            user = await run_in_threadpool(auth_manager.get_current_user, token)
         return user
     except AuthenticationError as e:
         raise HTTPException(
@@ -37,6 +38,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+CurrentUser = Depends(get_current_user)
+
+# Endpoints are plain functions: they use the blocking psycopg2 helpers, so FastAPI
+# runs them on its threadpool instead of the event loop
 router = APIRouter(prefix="/api/race-analysis", tags=["race-analysis"])
 
 # Pydantic models for race analysis
@@ -92,18 +97,18 @@ class RaceAnalysisDetail(RaceAnalysisResponse):
     trackPointsData: List[Dict[str, Any]]
 
 @router.post("/", response_model=Dict[str, Any])
-async def create_race_analysis(
+def create_race_analysis(
     analysis_data: RaceAnalysisCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Create a new race analysis with track points and waypoint comparisons"""
     
     logger.info(f"Creating race analysis for user {current_user.id}, route {analysis_data.routeId}")
     logger.info(f"Analysis data: raceName={analysis_data.raceName}, raceDate={analysis_data.raceDate}")
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        # get_db_cursor commits when the block exits normally and rolls back on any exception
+        with get_db_cursor() as cursor:
             # Create the race analysis
             logger.info("Executing create_race_analysis function")
             cursor.execute("""
@@ -186,8 +191,6 @@ async def create_race_analysis(
             comparisons_result = cursor.fetchone()
             comparisons_added = comparisons_result['add_waypoint_comparisons'] if hasattr(comparisons_result, 'keys') else comparisons_result[0]
             
-            conn.commit()
-            
             return {
                 "id": analysis_id,
                 "message": "Race analysis saved successfully",
@@ -200,191 +203,186 @@ async def create_race_analysis(
         logger.error(f"Exception type: {type(e).__name__}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
-        conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save race analysis: {str(e)}"
         )
-    finally:
-        conn.close()
 
 @router.get("/", response_model=List[RaceAnalysisResponse])
-async def get_user_race_analyses(current_user: User = Depends(get_current_user)):
+def get_user_race_analyses(current_user: User = CurrentUser):
     """Get all race analyses for the current user"""
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with get_db_cursor(autocommit=True) as cursor:
             cursor.execute("""
                 SELECT * FROM get_user_race_analyses(%s)
             """, (current_user.id,))
             
-            analyses = []
-            for row in cursor.fetchall():
-                # Handle both tuple and RealDictRow formats
-                if hasattr(row, 'keys'):
-                    analyses.append(RaceAnalysisResponse(
-                        id=row['id'],
-                        routeId=row['route_id'],
-                        routeName=row['route_name'],
-                        raceName=row['race_name'],
-                        raceDate=row['race_date'],
-                        actualGpxFilename=row['actual_gpx_filename'],
-                        totalRaceTimeSeconds=row['total_race_time_seconds'],
-                        totalActualDistanceMeters=float(row['total_actual_distance_meters']),
-                        raceStartTime=row['race_start_time'],
-                        notes=row['notes'],
-                        createdAt=row['created_at'],
-                        waypointCount=row['waypoint_count'],
-                        trackPointCount=row['track_point_count']
-                    ))
-                else:
-                    analyses.append(RaceAnalysisResponse(
-                        id=row[0],
-                        routeId=row[1],
-                        routeName=row[2],
-                        raceName=row[3],
-                        raceDate=row[4],
-                        actualGpxFilename=row[5],
-                        totalRaceTimeSeconds=row[6],
-                        totalActualDistanceMeters=float(row[7]),
-                        raceStartTime=row[8],
-                        notes=row[9],
-                        createdAt=row[10],
-                        waypointCount=row[11],
-                        trackPointCount=row[12]
-                    ))
-            
-            return analyses
-            
+            rows = cursor.fetchall()
+        
+        analyses = []
+        for row in rows:
+            # Handle both tuple and RealDictRow formats
+            if hasattr(row, 'keys'):
+                analyses.append(RaceAnalysisResponse(
+                    id=row['id'],
+                    routeId=row['route_id'],
+                    routeName=row['route_name'],
+                    raceName=row['race_name'],
+                    raceDate=row['race_date'],
+                    actualGpxFilename=row['actual_gpx_filename'],
+                    totalRaceTimeSeconds=row['total_race_time_seconds'],
+                    totalActualDistanceMeters=float(row['total_actual_distance_meters']),
+                    raceStartTime=row['race_start_time'],
+                    notes=row['notes'],
+                    createdAt=row['created_at'],
+                    waypointCount=row['waypoint_count'],
+                    trackPointCount=row['track_point_count']
+                ))
+            else:
+                analyses.append(RaceAnalysisResponse(
+                    id=row[0],
+                    routeId=row[1],
+                    routeName=row[2],
+                    raceName=row[3],
+                    raceDate=row[4],
+                    actualGpxFilename=row[5],
+                    totalRaceTimeSeconds=row[6],
+                    totalActualDistanceMeters=float(row[7]),
+                    raceStartTime=row[8],
+                    notes=row[9],
+                    createdAt=row[10],
+                    waypointCount=row[11],
+                    trackPointCount=row[12]
+                ))
+        
+        return analyses
+        
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve race analyses: {str(e)}"
         )
-    finally:
-        conn.close()
 
 @router.get("/route/{route_id}", response_model=List[RaceAnalysisResponse])
-async def get_route_race_analyses(
+def get_route_race_analyses(
     route_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Get all race analyses for a specific route"""
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with get_db_cursor(autocommit=True) as cursor:
             cursor.execute("""
                 SELECT * FROM get_route_race_analyses(%s, %s)
             """, (route_id, current_user.id))
             
-            analyses = []
-            for row in cursor.fetchall():
-                # Handle both tuple and RealDictRow formats
-                if hasattr(row, 'keys'):
-                    analyses.append(RaceAnalysisResponse(
-                        id=row['id'],
-                        routeId=route_id,
-                        routeName="",  # Not returned by this function
-                        raceName=row['race_name'],
-                        raceDate=row['race_date'],
-                        actualGpxFilename=row['actual_gpx_filename'],
-                        totalRaceTimeSeconds=row['total_race_time_seconds'],
-                        totalActualDistanceMeters=float(row['total_actual_distance_meters']),
-                        raceStartTime=row['race_start_time'],
-                        notes=row['notes'],
-                        createdAt=row['created_at'],
-                        waypointCount=row['waypoint_count']
-                    ))
-                else:
-                    analyses.append(RaceAnalysisResponse(
-                        id=row[0],
-                        routeId=route_id,
-                        routeName="",  # Not returned by this function
-                        raceName=row[1],
-                        raceDate=row[2],
-                        actualGpxFilename=row[3],
-                        totalRaceTimeSeconds=row[4],
-                        totalActualDistanceMeters=float(row[5]),
-                        raceStartTime=row[6],
-                        notes=row[7],
-                        createdAt=row[8],
-                        waypointCount=row[9]
-                    ))
-            
-            return analyses
-            
+            rows = cursor.fetchall()
+        
+        analyses = []
+        for row in rows:
+            # Handle both tuple and RealDictRow formats
+            if hasattr(row, 'keys'):
+                analyses.append(RaceAnalysisResponse(
+                    id=row['id'],
+                    routeId=route_id,
+                    routeName="",  # Not returned by this function
+                    raceName=row['race_name'],
+                    raceDate=row['race_date'],
+                    actualGpxFilename=row['actual_gpx_filename'],
+                    totalRaceTimeSeconds=row['total_race_time_seconds'],
+                    totalActualDistanceMeters=float(row['total_actual_distance_meters']),
+                    raceStartTime=row['race_start_time'],
+                    notes=row['notes'],
+                    createdAt=row['created_at'],
+                    waypointCount=row['waypoint_count']
+                ))
+            else:
+                analyses.append(RaceAnalysisResponse(
+                    id=row[0],
+                    routeId=route_id,
+                    routeName="",  # Not returned by this function
+                    raceName=row[1],
+                    raceDate=row[2],
+                    actualGpxFilename=row[3],
+                    totalRaceTimeSeconds=row[4],
+                    totalActualDistanceMeters=float(row[5]),
+                    raceStartTime=row[6],
+                    notes=row[7],
+                    createdAt=row[8],
+                    waypointCount=row[9]
+                ))
+        
+        return analyses
+        
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve route race analyses: {str(e)}"
         )
-    finally:
-        conn.close()
 
 @router.get("/{analysis_id}", response_model=RaceAnalysisDetail)
-async def get_race_analysis_detail(
+def get_race_analysis_detail(
     analysis_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Get detailed race analysis with comparisons and track points"""
     
     logger.info(f"Getting race analysis detail for ID {analysis_id}, user {current_user.id}")
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with get_db_cursor(autocommit=True) as cursor:
             logger.info("Executing get_race_analysis_detail database function")
             cursor.execute("""
                 SELECT * FROM get_race_analysis_detail(%s, %s)
             """, (analysis_id, current_user.id))
             
             row = cursor.fetchone()
-            logger.info(f"Database function returned: {row}")
-            if not row:
-                logger.warning(f"No race analysis found for ID {analysis_id}")
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Race analysis not found"
-                )
-            
-            # Handle both tuple and RealDictRow formats
-            if hasattr(row, 'keys'):
-                return RaceAnalysisDetail(
-                    id=row['analysis_id'],
-                    routeId=row['route_id'],
-                    routeName=row['route_name'],
-                    raceName=row['race_name'],
-                    raceDate=row['race_date'],
-                    actualGpxFilename=row['actual_gpx_filename'],
-                    totalRaceTimeSeconds=row['total_race_time_seconds'],
-                    totalActualDistanceMeters=float(row['total_actual_distance_meters']),
-                    raceStartTime=row['race_start_time'],
-                    notes=row['notes'],
-                    createdAt=row['created_at'],
-                    comparisonData=row['comparison_data'] if row['comparison_data'] else [],
-                    trackPointsData=row['track_points_data'] if row['track_points_data'] else [],
-                    waypointCount=len(row['comparison_data']) if row['comparison_data'] else 0
-                )
-            else:
-                return RaceAnalysisDetail(
-                    id=row[0],
-                    routeId=row[1],
-                    routeName=row[2],
-                    raceName=row[3],
-                    raceDate=row[4],
-                    actualGpxFilename=row[5],
-                    totalRaceTimeSeconds=row[6],
-                    totalActualDistanceMeters=float(row[7]),
-                    raceStartTime=row[8],
-                    notes=row[9],
-                    createdAt=row[10],
-                    comparisonData=row[11] if row[11] else [],
-                    trackPointsData=row[12] if row[12] else [],
-                    waypointCount=len(row[11]) if row[11] else 0
-                )
-            
+        
+        logger.info(f"Database function returned: {row}")
+        if not row:
+            logger.warning(f"No race analysis found for ID {analysis_id}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Race analysis not found"
+            )
+        
+        # Handle both tuple and RealDictRow formats
+        if hasattr(row, 'keys'):
+            return RaceAnalysisDetail(
+                id=row['analysis_id'],
+                routeId=row['route_id'],
+                routeName=row['route_name'],
+                raceName=row['race_name'],
+                raceDate=row['race_date'],
+                actualGpxFilename=row['actual_gpx_filename'],
+                totalRaceTimeSeconds=row['total_race_time_seconds'],
+                totalActualDistanceMeters=float(row['total_actual_distance_meters']),
+                raceStartTime=row['race_start_time'],
+                notes=row['notes'],
+                createdAt=row['created_at'],
+                comparisonData=row['comparison_data'] if row['comparison_data'] else [],
+                trackPointsData=row['track_points_data'] if row['track_points_data'] else [],
+                waypointCount=len(row['comparison_data']) if row['comparison_data'] else 0
+            )
+        else:
+            return RaceAnalysisDetail(
+                id=row[0],
+                routeId=row[1],
+                routeName=row[2],
+                raceName=row[3],
+                raceDate=row[4],
+                actualGpxFilename=row[5],
+                totalRaceTimeSeconds=row[6],
+                totalActualDistanceMeters=float(row[7]),
+                raceStartTime=row[8],
+                notes=row[9],
+                createdAt=row[10],
+                comparisonData=row[11] if row[11] else [],
+                trackPointsData=row[12] if row[12] else [],
+                waypointCount=len(row[11]) if row[11] else 0
+            )
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -396,43 +394,35 @@ async def get_race_analysis_detail(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve race analysis detail: {str(e)}"
         )
-    finally:
-        conn.close()
 
 @router.delete("/{analysis_id}")
-async def delete_race_analysis(
+def delete_race_analysis(
     analysis_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Delete a race analysis"""
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
+        with get_db_cursor() as cursor:
             cursor.execute("""
                 SELECT delete_race_analysis(%s, %s)
             """, (analysis_id, current_user.id))
             
             delete_result = cursor.fetchone()
             deleted = delete_result['delete_race_analysis'] if hasattr(delete_result, 'keys') else delete_result[0]
-            
-            if not deleted:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Race analysis not found"
-                )
-            
-            conn.commit()
-            
-            return {"message": "Race analysis deleted successfully"}
-            
+        
+        if not deleted:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Race analysis not found"
+            )
+        
+        return {"message": "Race analysis deleted successfully"}
+        
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete race analysis: {str(e)}"
         )
-    finally:
-        conn.close() 
\ No newline at end of file
@@ -7,14 +7,16 @@ Handles user registration, login, JWT token management, and session security.
 import os
 import hashlib
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import jwt
 from passlib.context import CryptContext
 from passlib.hash import pbkdf2_sha256
 
 from models import UserCreate, UserLogin, User, PasswordResetRequest, PasswordResetConfirm
-from database import get_db_connection
+from database import get_db_cursor
 from exceptions import AuthenticationError, ValidationError
 from email_service import email_service
 from logging_config import get_logger
@@ -30,6 +32,24 @@ JWT_ALGORITHM = "HS256"
 JWT_ACCESS_TOKEN_EXPIRE_HOURS = 24 * 7  # 7 days
 
 
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """
+    Extract the token from an Authorization header value.
+    
+    Args:
+        authorization: Raw header value, or None when the header is absent
+        
+    Returns:
+        The token, or None if the header is missing or not a Bearer credential
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
+
+
 class AuthManager:
     """Handles user authentication and authorization."""
     
@@ -37,6 +57,12 @@ class AuthManager:
         self.secret_key = JWT_SECRET_KEY
         self.algorithm = JWT_ALGORITHM
         self.access_token_expire_hours = JWT_ACCESS_TOKEN_EXPIRE_HOURS
+        # Authenticated users by SHA-256 of their token, so repeat requests skip the JWT
+        # decode and user lookup; entries never outlive the token's own expiry
+        self.user_cache_ttl_seconds = 30.0
+        self.user_cache_max_entries = 10000
+        self._user_cache: Dict[bytes, Tuple[float, User]] = {}
+        self._user_cache_lock = threading.Lock()
     
     def hash_password(self, password: str) -> str:
         """Hash a password using PBKDF2."""
@@ -104,35 +130,33 @@ class AuthManager:
             if not invitation_manager.is_email_approved(user_data.email.strip()):
                 raise ValidationError("Registration is by invitation only. Your email address has not been approved for registration.")
             
-            # Check if user already exists
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT id FROM users WHERE username = %s OR email = %s",
-                (user_data.username.strip(), user_data.email.strip())
-            )
-            
-            if cursor.fetchone():
-                raise ValidationError("Username or email already exists")
-            
-            # Hash password and create user
+            # Hash before checking out a connection, so it isn't held during the slow hash
             hashed_password = self.hash_password(user_data.password)
             
-            cursor.execute("""
-                INSERT INTO users (username, email, password_hash)
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (user_data.username.strip(), user_data.email.strip(), hashed_password))
+            # Check if user already exists, then create the user in the same transaction
+            result = None
+            with get_db_cursor() as cursor:
+                cursor.execute(
+                    "SELECT id FROM users WHERE username = %s OR email = %s",
+                    (user_data.username.strip(), user_data.email.strip())
+                )
+                existing = cursor.fetchone()
+                
+                if not existing:
+                    cursor.execute("""
+                        INSERT INTO users (username, email, password_hash)
+                        VALUES (%s, %s, %s)
+                        RETURNING id
+                    """, (user_data.username.strip(), user_data.email.strip(), hashed_password))
+                    result = cursor.fetchone()
+            
+            if existing:
+                raise ValidationError("Username or email already exists")
             
-            result = cursor.fetchone()
             user_id = result['id'] if result else None
             
             if not user_id:
                 raise AuthenticationError("Failed to create user")
-                
-            conn.commit()
-            conn.close()
             
             # Create access token
             access_token = self.create_access_token(user_id, user_data.username.strip())
@@ -156,18 +180,15 @@ class AuthManager:
     def login_user(self, login_data: UserLogin) -> Dict[str, Any]:
         """Authenticate user login."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Find user by username or email
-            cursor.execute("""
-                SELECT id, username, email, password_hash, is_active
-                FROM users 
-                WHERE (username = %s OR email = %s) AND is_active = TRUE
-            """, (login_data.username_or_email, login_data.username_or_email))
-            
-            user_row = cursor.fetchone()
-            conn.close()
+            with get_db_cursor(autocommit=True) as cursor:
+                # Find user by username or email
+                cursor.execute("""
+                    SELECT id, username, email, password_hash, is_active
+                    FROM users 
+                    WHERE (username = %s OR email = %s) AND is_active = TRUE
+                """, (login_data.username_or_email, login_data.username_or_email))
+                
+                user_row = cursor.fetchone()
             
             if not user_row:
                 raise AuthenticationError("Invalid username/email or password")
@@ -201,8 +222,26 @@ class AuthManager:
             logger.error(f"Error during login for {login_data.username_or_email}: {str(e)}")
             raise AuthenticationError("Login failed")
     
+    def get_cached_user(self, token: str) -> Optional[User]:
+        """Return the user for a recently authenticated token, without touching the database."""
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with self._user_cache_lock:
+            entry = self._user_cache.get(cache_key)
+        if entry is None:
+            return None
+        if time.monotonic() < entry[0]:
+            return entry[1]
+        with self._user_cache_lock:
+            self._user_cache.pop(cache_key, None)
+        return None
+    
     def get_current_user(self, token: str) -> User:
         """Get current user from JWT token."""
+        user = self.get_cached_user(token)
+        if user is not None:
+            return user
+        
+        cache_key = hashlib.sha256(token.encode()).digest()
         try:
             payload = self.verify_token(token)
             user_id = payload.get("user_id")
@@ -210,17 +249,14 @@ class AuthManager:
             if not user_id:
                 raise AuthenticationError("Invalid token payload")
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT id, username, email, created_at, is_active
-                FROM users 
-                WHERE id = %s AND is_active = TRUE
-            """, (user_id,))
-            
-            user_row = cursor.fetchone()
-            conn.close()
+            with get_db_cursor(autocommit=True) as cursor:
+                cursor.execute("""
+                    SELECT id, username, email, created_at, is_active
+                    FROM users 
+                    WHERE id = %s AND is_active = TRUE
+                """, (user_id,))
+                
+                user_row = cursor.fetchone()
             
             if not user_row:
                 raise AuthenticationError("User not found or inactive")
@@ -231,7 +267,8 @@ class AuthManager:
             created_at = user_row['created_at']
             is_active = user_row['is_active']
             
-            return User(
+            # Fields come straight from typed users columns, so skip re-validating them
+            user = User.model_construct(
                 id=user_id,
                 username=username,
                 email=email,
@@ -239,6 +276,18 @@ class AuthManager:
                 is_active=is_active
             )
             
+            ttl = self.user_cache_ttl_seconds
+            exp = payload.get("exp")
+            if exp:
+                ttl = min(ttl, exp - time.time())
+            if ttl > 0:
+                with self._user_cache_lock:
+                    if len(self._user_cache) >= self.user_cache_max_entries:
+                        self._user_cache.clear()
+                    self._user_cache[cache_key] = (time.monotonic() + ttl, user)
+            
+            return user
+            
         except AuthenticationError:
             raise
         except Exception as e:
@@ -248,17 +297,14 @@ class AuthManager:
     def validate_route_access(self, user_id: int, route_id: int) -> bool:
         """Check if user has access to a specific route."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT user_id, is_public 
-                FROM routes 
-                WHERE id = %s
-            """, (route_id,))
-            
-            route_row = cursor.fetchone()
-            conn.close()
+            with get_db_cursor(autocommit=True) as cursor:
+                cursor.execute("""
+                    SELECT user_id, is_public 
+                    FROM routes 
+                    WHERE id = %s
+                """, (route_id,))
+                
+                route_row = cursor.fetchone()
             
             if not route_row:
                 return False
@@ -279,31 +325,27 @@ class AuthManager:
             if len(new_password) < 8:
                 raise ValidationError("New password must be at least 8 characters long")
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
             # Get current password hash
-            cursor.execute("SELECT password_hash FROM users WHERE id = %s", (user_id,))
-            row = cursor.fetchone()
+            with get_db_cursor(autocommit=True) as cursor:
+                cursor.execute("SELECT password_hash FROM users WHERE id = %s", (user_id,))
+                row = cursor.fetchone()
             
             if not row:
                 raise AuthenticationError("User not found")
             
             current_hash = row['password_hash']
             
-            # Verify current password
+            # Verify current password; hashing runs with no connection checked out
             if not self.verify_password(current_password, current_hash):
                 raise AuthenticationError("Current password is incorrect")
             
             # Update password
             new_hash = self.hash_password(new_password)
-            cursor.execute(
-                "UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
-                (new_hash, user_id)
-            )
-            
-            conn.commit()
-            conn.close()
+            with get_db_cursor() as cursor:
+                cursor.execute(
+                    "UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                    (new_hash, user_id)
+                )
             
             logger.info(f"Password changed successfully for user ID: {user_id}")
             return True
@@ -321,16 +363,31 @@ class AuthManager:
             if not email or "@" not in email:
                 raise ValidationError("Invalid email address")
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Find user by email
-            cursor.execute(
-                "SELECT id, username, email, is_active FROM users WHERE email = %s AND is_active = TRUE",
-                (email.strip(),)
-            )
+            # Generate secure reset token
+            reset_token = secrets.token_urlsafe(32)
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=1)  # 1 hour expiry
             
-            user_row = cursor.fetchone()
+            with get_db_cursor() as cursor:
+                # Find user by email
+                cursor.execute(
+                    "SELECT id, username, email, is_active FROM users WHERE email = %s AND is_active = TRUE",
+                    (email.strip(),)
+                )
+                
+                user_row = cursor.fetchone()
+                
+                if user_row:
+                    # Deactivate any existing reset tokens for this user
+                    cursor.execute(
+                        "UPDATE password_reset_tokens SET is_active = FALSE WHERE user_id = %s AND is_active = TRUE",
+                        (user_row['id'],)
+                    )
+                    
+                    # Insert new reset token
+                    cursor.execute("""
+                        INSERT INTO password_reset_tokens (user_id, token, expires_at)
+                        VALUES (%s, %s, %s)
+                    """, (user_row['id'], reset_token, expires_at))
             
             if not user_row:
                 # For security, don't reveal if email exists or not
@@ -342,32 +399,14 @@ class AuthManager:
             username = user_row['username']
             user_email = user_row['email']
             
-            # Generate secure reset token
-            reset_token = secrets.token_urlsafe(32)
-            expires_at = datetime.now(timezone.utc) + timedelta(hours=1)  # 1 hour expiry
-            
-            # Deactivate any existing reset tokens for this user
-            cursor.execute(
-                "UPDATE password_reset_tokens SET is_active = FALSE WHERE user_id = %s AND is_active = TRUE",
-                (user_id,)
-            )
-            
-            # Insert new reset token
-            cursor.execute("""
-                INSERT INTO password_reset_tokens (user_id, token, expires_at)
-                VALUES (%s, %s, %s)
-            """, (user_id, reset_token, expires_at))
-            
-            conn.commit()
-            conn.close()
-            
             # Send password reset email
-            email_sent = email_service.send_password_reset_email(user_email, username, reset_token)
+            # Queued only; the email worker logs the delivery result
+            email_queued = email_service.send_password_reset_email(user_email, username, reset_token)
             
-            if email_sent:
-                logger.info(f"Password reset token generated and email sent for user: {username} (ID: {user_id})")
+            if email_queued:
+                logger.info(f"Password reset token generated and email queued for user: {username} (ID: {user_id})")
             else:
-                logger.error(f"Password reset token generated but email failed for user: {username} (ID: {user_id})")
+                logger.error(f"Password reset token generated but email could not be queued for user: {username} (ID: {user_id})")
             
             return True  # Always return True for security (don't reveal if email exists)
             
@@ -385,57 +424,52 @@ class AuthManager:
             if not new_password or len(new_password) < 8:
                 raise ValidationError("New password must be at least 8 characters long")
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Find valid, unused token
-            cursor.execute("""
-                SELECT rt.id, rt.user_id, rt.expires_at, u.username, u.email
-                FROM password_reset_tokens rt
-                JOIN users u ON rt.user_id = u.id
-                WHERE rt.token = %s 
-                  AND rt.is_active = TRUE 
-                  AND rt.used_at IS NULL 
-                  AND rt.expires_at > %s
-                  AND u.is_active = TRUE
-            """, (token, datetime.now(timezone.utc)))
+            # Hash new password before checking out a connection
+            new_password_hash = self.hash_password(new_password)
             
-            token_row = cursor.fetchone()
+            with get_db_cursor() as cursor:
+                # Find valid, unused token
+                cursor.execute("""
+                    SELECT rt.id, rt.user_id, rt.expires_at, u.username, u.email
+                    FROM password_reset_tokens rt
+                    JOIN users u ON rt.user_id = u.id
+                    WHERE rt.token = %s 
+                      AND rt.is_active = TRUE 
+                      AND rt.used_at IS NULL 
+                      AND rt.expires_at > %s
+                      AND u.is_active = TRUE
+                """, (token, datetime.now(timezone.utc)))
+                
+                token_row = cursor.fetchone()
+                
+                if token_row:
+                    # Update user's password
+                    cursor.execute("""
+                        UPDATE users 
+                        SET password_hash = %s, updated_at = CURRENT_TIMESTAMP 
+                        WHERE id = %s
+                    """, (new_password_hash, token_row['user_id']))
+                    
+                    # Mark token as used
+                    cursor.execute("""
+                        UPDATE password_reset_tokens 
+                        SET used_at = CURRENT_TIMESTAMP, is_active = FALSE 
+                        WHERE id = %s
+                    """, (token_row['id'],))
+                    
+                    # Deactivate all other reset tokens for this user
+                    cursor.execute("""
+                        UPDATE password_reset_tokens 
+                        SET is_active = FALSE 
+                        WHERE user_id = %s AND id != %s
+                    """, (token_row['user_id'], token_row['id']))
             
             if not token_row:
                 raise AuthenticationError("Invalid or expired reset token")
             
-            token_id = token_row['id']
             user_id = token_row['user_id']
             username = token_row['username']
             
-            # Hash new password
-            new_password_hash = self.hash_password(new_password)
-            
-            # Update user's password
-            cursor.execute("""
-                UPDATE users 
-                SET password_hash = %s, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = %s
-            """, (new_password_hash, user_id))
-            
-            # Mark token as used
-            cursor.execute("""
-                UPDATE password_reset_tokens 
-                SET used_at = CURRENT_TIMESTAMP, is_active = FALSE 
-                WHERE id = %s
-            """, (token_id,))
-            
-            # Deactivate all other reset tokens for this user
-            cursor.execute("""
-                UPDATE password_reset_tokens 
-                SET is_active = FALSE 
-                WHERE user_id = %s AND id != %s
-            """, (user_id, token_id))
-            
-            conn.commit()
-            conn.close()
-            
             logger.info(f"Password reset completed successfully for user: {username} (ID: {user_id})")
             return True
             
@@ -448,15 +482,11 @@ class AuthManager:
     def cleanup_expired_reset_tokens(self) -> int:
         """Clean up expired password reset tokens (for maintenance)."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Use the database function we created
-            cursor.execute("SELECT cleanup_expired_password_reset_tokens()")
-            result = cursor.fetchone()
-            deleted_count = result[0] if result else 0
-            
-            conn.close()
+            with get_db_cursor() as cursor:
+                # Use the database function we created
+                cursor.execute("SELECT cleanup_expired_password_reset_tokens() AS deleted_count")
+                result = cursor.fetchone()
+            deleted_count = result['deleted_count'] if result else 0
             
             if deleted_count > 0:
                 logger.info(f"Cleaned up {deleted_count} expired password reset tokens")
@@ -29,82 +29,95 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Function to add race track points
+-- Inserts all points with one set-based statement instead of one INSERT per point
 CREATE OR REPLACE FUNCTION add_race_track_points(
     p_race_analysis_id INTEGER,
     p_track_points JSONB
 )
 RETURNS INTEGER AS $$
 DECLARE
-    v_point JSONB;
-    v_count INTEGER := 0;
+    v_count INTEGER;
 BEGIN
-    FOR v_point IN SELECT * FROM jsonb_array_elements(p_track_points)
-    LOOP
-        INSERT INTO race_track_points (
-            race_analysis_id, latitude, longitude, elevation_meters,
-            race_time_seconds, cumulative_distance_meters, point_order
-        ) VALUES (
-            p_race_analysis_id,
-            (v_point->>'lat')::DECIMAL(10,8),
-            (v_point->>'lon')::DECIMAL(11,8),
-            CASE WHEN v_point->>'elevation' IS NOT NULL THEN (v_point->>'elevation')::DECIMAL(8,2) ELSE NULL END,
-            (v_point->>'cumulativeTime')::INTEGER,
-            (v_point->>'cumulativeDistance')::DECIMAL(10,2),
-            (v_point->>'order')::INTEGER
-        );
-        v_count := v_count + 1;
-    END LOOP;
+    INSERT INTO race_track_points (
+        race_analysis_id, latitude, longitude, elevation_meters,
+        race_time_seconds, cumulative_distance_meters, point_order
+    )
+    SELECT
+        p_race_analysis_id,
+        p.lat,
+        p.lon,
+        p.elevation,
+        p."cumulativeTime",
+        p."cumulativeDistance",
+        p."order"
+    FROM jsonb_to_recordset(p_track_points) AS p(
+        lat DECIMAL(10,8),
+        lon DECIMAL(11,8),
+        elevation DECIMAL(8,2),
+        "cumulativeTime" INTEGER,
+        "cumulativeDistance" DECIMAL(10,2),
+        "order" INTEGER
+    );
     
+    GET DIAGNOSTICS v_count = ROW_COUNT;
     RETURN v_count;
 END;
 $$ LANGUAGE plpgsql;
 
 -- Function to add waypoint comparisons
+-- Inserts all comparisons with one set-based statement instead of one INSERT per comparison
 CREATE OR REPLACE FUNCTION add_waypoint_comparisons(
     p_race_analysis_id INTEGER,
     p_comparisons JSONB
 )
 RETURNS INTEGER AS $$
 DECLARE
-    v_comparison JSONB;
-    v_count INTEGER := 0;
-    v_track_point_id INTEGER;
+    v_count INTEGER;
 BEGIN
-    FOR v_comparison IN SELECT * FROM jsonb_array_elements(p_comparisons)
-    LOOP
-        -- Find the closest track point ID if coordinates are provided
-        v_track_point_id := NULL;
-        IF v_comparison->>'closestPointLat' IS NOT NULL AND v_comparison->>'closestPointLon' IS NOT NULL THEN
-            SELECT id INTO v_track_point_id
-            FROM race_track_points 
-            WHERE race_analysis_id = p_race_analysis_id
-            ORDER BY (
-                POW(latitude - (v_comparison->>'closestPointLat')::DECIMAL(10,8), 2) +
-                POW(longitude - (v_comparison->>'closestPointLon')::DECIMAL(11,8), 2)
-            ) ASC
-            LIMIT 1;
-        END IF;
-        
-        INSERT INTO race_waypoint_comparisons (
-            race_analysis_id, waypoint_id, planned_cumulative_time_seconds,
-            actual_cumulative_time_seconds, time_difference_seconds, leg_duration_seconds,
-            leg_distance_miles, actual_pace_seconds_per_mile, planned_pace_seconds_per_mile,
-            closest_track_point_id
-        ) VALUES (
-            p_race_analysis_id,
-            (v_comparison->>'waypointId')::INTEGER,
-            (v_comparison->>'plannedCumulativeTime')::INTEGER,
-            CASE WHEN v_comparison->>'actualCumulativeTime' IS NOT NULL THEN (v_comparison->>'actualCumulativeTime')::INTEGER ELSE NULL END,
-            CASE WHEN v_comparison->>'timeDifference' IS NOT NULL THEN (v_comparison->>'timeDifference')::INTEGER ELSE NULL END,
-            CASE WHEN v_comparison->>'legDuration' IS NOT NULL THEN (v_comparison->>'legDuration')::INTEGER ELSE NULL END,
-            CASE WHEN v_comparison->>'legDistance' IS NOT NULL THEN (v_comparison->>'legDistance')::DECIMAL(8,4) ELSE NULL END,
-            CASE WHEN v_comparison->>'actualPace' IS NOT NULL THEN (v_comparison->>'actualPace')::INTEGER ELSE NULL END,
-            CASE WHEN v_comparison->>'plannedPace' IS NOT NULL THEN (v_comparison->>'plannedPace')::INTEGER ELSE NULL END,
-            v_track_point_id
-        );
-        v_count := v_count + 1;
-    END LOOP;
+    INSERT INTO race_waypoint_comparisons (
+        race_analysis_id, waypoint_id, planned_cumulative_time_seconds,
+        actual_cumulative_time_seconds, time_difference_seconds, leg_duration_seconds,
+        leg_distance_miles, actual_pace_seconds_per_mile, planned_pace_seconds_per_mile,
+        closest_track_point_id
+    )
+    SELECT
+        p_race_analysis_id,
+        c."waypointId",
+        c."plannedCumulativeTime",
+        c."actualCumulativeTime",
+        c."timeDifference",
+        c."legDuration",
+        c."legDistance",
+        c."actualPace",
+        c."plannedPace",
+        closest.id
+    FROM jsonb_to_recordset(p_comparisons) AS c(
+        "waypointId" INTEGER,
+        "plannedCumulativeTime" INTEGER,
+        "actualCumulativeTime" INTEGER,
+        "timeDifference" INTEGER,
+        "legDuration" INTEGER,
+        "legDistance" DECIMAL(8,4),
+        "actualPace" INTEGER,
+        "plannedPace" INTEGER,
+        "closestPointLat" DECIMAL(10,8),
+        "closestPointLon" DECIMAL(11,8)
+    )
+    -- Find the closest track point ID if coordinates are provided
+    LEFT JOIN LATERAL (
+        SELECT tp.id
+        FROM race_track_points tp
+        WHERE tp.race_analysis_id = p_race_analysis_id
+          AND c."closestPointLat" IS NOT NULL
+          AND c."closestPointLon" IS NOT NULL
+        ORDER BY (
+            POW(tp.latitude - c."closestPointLat", 2) +
+            POW(tp.longitude - c."closestPointLon", 2)
+        ) ASC
+        LIMIT 1
+    ) closest ON TRUE;
     
+    GET DIAGNOSTICS v_count = ROW_COUNT;
     RETURN v_count;
 END;
 $$ LANGUAGE plpgsql;
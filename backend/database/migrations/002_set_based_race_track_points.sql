@@ -0,0 +1,39 @@
+-- Migration: Insert race track points with a single set-based statement
+-- Date: 2026-10-15
+-- Description: Replace the per-point INSERT loop in add_race_track_points with one
+-- INSERT ... SELECT over jsonb_to_recordset(), so the executor plans and runs the
+-- insert once for the whole batch
+
+CREATE OR REPLACE FUNCTION add_race_track_points(
+    p_race_analysis_id INTEGER,
+    p_track_points JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO race_track_points (
+        race_analysis_id, latitude, longitude, elevation_meters,
+        race_time_seconds, cumulative_distance_meters, point_order
+    )
+    SELECT
+        p_race_analysis_id,
+        p.lat,
+        p.lon,
+        p.elevation,
+        p."cumulativeTime",
+        p."cumulativeDistance",
+        p."order"
+    FROM jsonb_to_recordset(p_track_points) AS p(
+        lat DECIMAL(10,8),
+        lon DECIMAL(11,8),
+        elevation DECIMAL(8,2),
+        "cumulativeTime" INTEGER,
+        "cumulativeDistance" DECIMAL(10,2),
+        "order" INTEGER
+    );
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
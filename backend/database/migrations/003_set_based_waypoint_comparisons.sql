@@ -0,0 +1,61 @@
+-- Migration: Insert waypoint comparisons with a single set-based statement
+-- Date: 2026-10-15
+-- Description: Replace the per-comparison INSERT loop in add_waypoint_comparisons with
+-- one INSERT ... SELECT over jsonb_to_recordset(), resolving the closest track point
+-- with a LATERAL join instead of a separate lookup per comparison
+
+CREATE OR REPLACE FUNCTION add_waypoint_comparisons(
+    p_race_analysis_id INTEGER,
+    p_comparisons JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO race_waypoint_comparisons (
+        race_analysis_id, waypoint_id, planned_cumulative_time_seconds,
+        actual_cumulative_time_seconds, time_difference_seconds, leg_duration_seconds,
+        leg_distance_miles, actual_pace_seconds_per_mile, planned_pace_seconds_per_mile,
+        closest_track_point_id
+    )
+    SELECT
+        p_race_analysis_id,
+        c."waypointId",
+        c."plannedCumulativeTime",
+        c."actualCumulativeTime",
+        c."timeDifference",
+        c."legDuration",
+        c."legDistance",
+        c."actualPace",
+        c."plannedPace",
+        closest.id
+    FROM jsonb_to_recordset(p_comparisons) AS c(
+        "waypointId" INTEGER,
+        "plannedCumulativeTime" INTEGER,
+        "actualCumulativeTime" INTEGER,
+        "timeDifference" INTEGER,
+        "legDuration" INTEGER,
+        "legDistance" DECIMAL(8,4),
+        "actualPace" INTEGER,
+        "plannedPace" INTEGER,
+        "closestPointLat" DECIMAL(10,8),
+        "closestPointLon" DECIMAL(11,8)
+    )
+    -- Find the closest track point ID if coordinates are provided
+    LEFT JOIN LATERAL (
+        SELECT tp.id
+        FROM race_track_points tp
+        WHERE tp.race_analysis_id = p_race_analysis_id
+          AND c."closestPointLat" IS NOT NULL
+          AND c."closestPointLon" IS NOT NULL
+        ORDER BY (
+            POW(tp.latitude - c."closestPointLat", 2) +
+            POW(tp.longitude - c."closestPointLon", 2)
+        ) ASC
+        LIMIT 1
+    ) closest ON TRUE;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
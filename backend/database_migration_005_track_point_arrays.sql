@@ -0,0 +1,50 @@
+-- Database Migration Script 005 - Store Track Points as Arrays on Routes
+-- Moves track points from one row per point to parallel double precision arrays
+-- on the routes row (lat/lon/elevation/distance), cutting per-point tuple overhead
+-- Run this on existing databases before deploying the matching backend
+
+DO $$ 
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns 
+        WHERE table_name = 'routes' 
+        AND column_name = 'track_lat'
+    ) THEN
+        ALTER TABLE routes 
+            ADD COLUMN track_lat DOUBLE PRECISION[],
+            ADD COLUMN track_lon DOUBLE PRECISION[],
+            ADD COLUMN track_elev DOUBLE PRECISION[],
+            ADD COLUMN track_dist DOUBLE PRECISION[];
+        RAISE NOTICE 'Added track point array columns to routes table';
+    ELSE
+        RAISE NOTICE 'Track point array columns already exist in routes table';
+    END IF;
+END $$;
+
+-- Backfill arrays from existing track_points rows, preserving point order
+UPDATE routes r
+SET track_lat = tp.lats,
+    track_lon = tp.lons,
+    track_elev = tp.elevs,
+    track_dist = tp.dists
+FROM (
+    SELECT route_id,
+           array_agg(latitude::double precision ORDER BY point_index) AS lats,
+           array_agg(longitude::double precision ORDER BY point_index) AS lons,
+           array_agg(elevation_meters::double precision ORDER BY point_index) AS elevs,
+           array_agg(cumulative_distance_meters::double precision ORDER BY point_index) AS dists
+    FROM track_points
+    GROUP BY route_id
+) tp
+WHERE r.id = tp.route_id
+AND r.track_lat IS NULL;
+
+-- Comments for documentation
+COMMENT ON COLUMN routes.track_lat IS 'Track point latitudes in route order (parallel to track_lon/track_elev/track_dist)';
+COMMENT ON COLUMN routes.track_lon IS 'Track point longitudes in route order';
+COMMENT ON COLUMN routes.track_elev IS 'Track point elevations in meters in route order (NULL entries allowed)';
+COMMENT ON COLUMN routes.track_dist IS 'Track point cumulative distances in meters in route order';
+COMMENT ON TABLE track_points IS 'Legacy row-per-point storage - new routes store track points in routes.track_* arrays';
+
+-- Verify the migration
+SELECT COUNT(*) AS routes_with_track_arrays FROM routes WHERE track_lat IS NOT NULL;
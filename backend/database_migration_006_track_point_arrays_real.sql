@@ -0,0 +1,30 @@
+-- Database Migration Script 006 - Store Track Point Arrays as Single Precision
+-- Narrows routes.track_* from double precision to real (4 bytes per value), halving
+-- the size of each route's track arrays. Matches the precision of the legacy
+-- track_points table, which already stored these values as REAL
+-- Run this on existing databases after migration 005
+
+DO $$ 
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns 
+        WHERE table_name = 'routes' 
+        AND column_name = 'track_lat'
+        AND udt_name = '_float8'
+    ) THEN
+        ALTER TABLE routes 
+            ALTER COLUMN track_lat TYPE REAL[] USING track_lat::REAL[],
+            ALTER COLUMN track_lon TYPE REAL[] USING track_lon::REAL[],
+            ALTER COLUMN track_elev TYPE REAL[] USING track_elev::REAL[],
+            ALTER COLUMN track_dist TYPE REAL[] USING track_dist::REAL[];
+        RAISE NOTICE 'Converted track point array columns to REAL[]';
+    ELSE
+        RAISE NOTICE 'Track point array columns are already REAL[]';
+    END IF;
+END $$;
+
+-- Verify the migration
+SELECT column_name, udt_name 
+FROM information_schema.columns 
+WHERE table_name = 'routes' 
+AND column_name LIKE 'track\_%';
@@ -0,0 +1,12 @@
+-- Database Migration Script 007 - Route List and Waypoint Order Indexes
+-- Adds the indexes behind the per-user route list (ordered by updated_at) and the
+-- per-route waypoint order. Fresh installs get them from database_schema.sql.
+-- CONCURRENTLY builds without blocking writes to routes/waypoints; it cannot run inside
+-- a transaction block, so run this file with plain psql (no -1 / --single-transaction)
+-- Run this on existing databases after migration 006
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_routes_user_updated
+    ON routes(user_id, updated_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_waypoints_order
+    ON waypoints(route_id, order_index);
@@ -30,6 +30,11 @@ CREATE TABLE routes (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     is_public BOOLEAN DEFAULT FALSE,
+    -- Track points stored column-wise as parallel arrays (one entry per point, in route order)
+    track_lat REAL[],
+    track_lon REAL[],
+    track_elev REAL[],
+    track_dist REAL[],
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -76,7 +81,7 @@ CREATE TABLE route_segments (
     FOREIGN KEY (to_waypoint_id) REFERENCES waypoints(id) ON DELETE CASCADE
 );
 
--- Track points - linked directly to routes for simpler management
+-- Track points - legacy row-per-point storage (new routes use the routes.track_* arrays)
 CREATE TABLE track_points (
     id SERIAL PRIMARY KEY,
     route_id INTEGER NOT NULL,
@@ -108,6 +113,7 @@ CREATE TABLE gpx_files (
 
 -- Indexes for performance
 CREATE INDEX idx_routes_user_id ON routes(user_id);
+CREATE INDEX idx_routes_user_updated ON routes(user_id, updated_at DESC);
 CREATE INDEX idx_waypoints_route_id ON waypoints(route_id);
 CREATE INDEX idx_waypoints_order ON waypoints(route_id, order_index);
 CREATE INDEX idx_route_segments_route_id ON route_segments(route_id);
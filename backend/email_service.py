@@ -6,9 +6,13 @@ Supports both production SMTP and development logging.
 """
 
 import os
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from string import Template
 from typing import Optional
 from datetime import datetime
 
@@ -16,6 +20,91 @@ from logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Email templates are parsed once at import; each send only substitutes the per-user values
+_PASSWORD_RESET_HTML_TEMPLATE = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Password Reset</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: #2563eb; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; background: #f8f9fa; }
+        .button { display: inline-block; padding: 12px 24px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }
+        .footer { padding: 20px; text-align: center; color: #666; font-size: 14px; }
+        .warning { background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; margin: 20px 0; border-radius: 5px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>RunPlan Pro</h1>
+            <p>Password Reset Request</p>
+        </div>
+        
+        <div class="content">
+            <h2>Hello $username,</h2>
+            
+            <p>We received a request to reset your password for your RunPlan Pro account.</p>
+            
+            <p>If you requested this password reset, click the button below to create a new password:</p>
+            
+            <p style="text-align: center;">
+                <a href="$reset_url" class="button">Reset Your Password</a>
+            </p>
+            
+            <p>Or copy and paste this link into your browser:</p>
+            <p style="word-break: break-all; background: #e9ecef; padding: 10px; border-radius: 3px;">
+                $reset_url
+            </p>
+            
+            <div class="warning">
+                <strong>Important:</strong>
+                <ul>
+                    <li>This link will expire in 1 hour for security reasons</li>
+                    <li>If you didn't request this reset, please ignore this email</li>
+                    <li>Your password will remain unchanged until you use this link</li>
+                </ul>
+            </div>
+            
+            <p>If you continue to have problems, please contact our support team.</p>
+        </div>
+        
+        <div class="footer">
+            <p>This email was sent on $timestamp</p>
+            <p>RunPlan Pro - Your Ultimate Route Planning Companion</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+# Plain text version for email clients that don't support HTML
+_PASSWORD_RESET_TEXT_TEMPLATE = Template("""
+RunPlan Pro - Password Reset Request
+
+Hello $username,
+
+We received a request to reset your password for your RunPlan Pro account.
+
+If you requested this password reset, visit the following link to create a new password:
+
+$reset_url
+
+IMPORTANT:
+- This link will expire in 1 hour for security reasons
+- If you didn't request this reset, please ignore this email
+- Your password will remain unchanged until you use this link
+
+If you continue to have problems, please contact our support team.
+
+This email was sent on $timestamp
+
+RunPlan Pro - Your Ultimate Route Planning Companion
+""")
+
 
 class EmailService:
     """Handles email sending functionality."""
@@ -38,99 +127,33 @@ class EmailService:
         
         if self.is_dev_mode:
             logger.warning("Email service running in development mode - emails will be logged, not sent")
+        
+        # Outgoing mail is handed to a pool of SMTP_POOL_SIZE background workers, each
+        # keeping its own SMTP connection open between sends; a connection is closed
+        # after SMTP_IDLE_TIMEOUT seconds without mail
+        self.smtp_pool_size = max(1, int(os.getenv("SMTP_POOL_SIZE", "4")))
+        self.smtp_idle_timeout = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+        # Socket timeout for every SMTP operation, so a stalled server can't hang a worker
+        self.smtp_timeout = float(os.getenv("SMTP_TIMEOUT", "30"))
+        # Longest close() waits on shutdown for the workers to drain the queue
+        self.smtp_shutdown_timeout = float(os.getenv("SMTP_SHUTDOWN_TIMEOUT", "10"))
+        self._queue = queue.Queue()
+        self._workers = []
+        self._worker_lock = threading.Lock()
+        self._local = threading.local()
     
     def send_password_reset_email(self, email: str, username: str, reset_token: str) -> bool:
-        """Send password reset email to user."""
+        """
+        Queue a password reset email for the user.
+        
+        Returns True once the message is queued; delivery happens on a background
+        worker, which logs whether the send succeeded.
+        """
         try:
             reset_url = f"{self.frontend_url}/reset-password?token={reset_token}"
             
             subject = "Password Reset Request - RunPlan Pro"
             
-            # Create HTML email content
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>Password Reset</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: #2563eb; color: white; padding: 20px; text-align: center; }}
-                    .content {{ padding: 20px; background: #f8f9fa; }}
-                    .button {{ display: inline-block; padding: 12px 24px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                    .footer {{ padding: 20px; text-align: center; color: #666; font-size: 14px; }}
-                    .warning {{ background: #fff3cd; border: 1px solid #ffeaa7; padding: 15px; margin: 20px 0; border-radius: 5px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>RunPlan Pro</h1>
-                        <p>Password Reset Request</p>
-                    </div>
-                    
-                    <div class="content">
-                        <h2>Hello {username},</h2>
-                        
-                        <p>We received a request to reset your password for your RunPlan Pro account.</p>
-                        
-                        <p>If you requested this password reset, click the button below to create a new password:</p>
-                        
-                        <p style="text-align: center;">
-                            <a href="{reset_url}" class="button">Reset Your Password</a>
-                        </p>
-                        
-                        <p>Or copy and paste this link into your browser:</p>
-                        <p style="word-break: break-all; background: #e9ecef; padding: 10px; border-radius: 3px;">
-                            {reset_url}
-                        </p>
-                        
-                        <div class="warning">
-                            <strong>Important:</strong>
-                            <ul>
-                                <li>This link will expire in 1 hour for security reasons</li>
-                                <li>If you didn't request this reset, please ignore this email</li>
-                                <li>Your password will remain unchanged until you use this link</li>
-                            </ul>
-                        </div>
-                        
-                        <p>If you continue to have problems, please contact our support team.</p>
-                    </div>
-                    
-                    <div class="footer">
-                        <p>This email was sent on {datetime.now().strftime('%B %d, %Y at %I:%M %p UTC')}</p>
-                        <p>RunPlan Pro - Your Ultimate Route Planning Companion</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            # Plain text version for email clients that don't support HTML
-            text_content = f"""
-            RunPlan Pro - Password Reset Request
-            
-            Hello {username},
-            
-            We received a request to reset your password for your RunPlan Pro account.
-            
-            If you requested this password reset, visit the following link to create a new password:
-            
-            {reset_url}
-            
-            IMPORTANT:
-            - This link will expire in 1 hour for security reasons
-            - If you didn't request this reset, please ignore this email
-            - Your password will remain unchanged until you use this link
-            
-            If you continue to have problems, please contact our support team.
-            
-            This email was sent on {datetime.now().strftime('%B %d, %Y at %I:%M %p UTC')}
-            
-            RunPlan Pro - Your Ultimate Route Planning Companion
-            """
-            
             if self.is_dev_mode:
                 # Development mode - just log the email
                 logger.info(f"[DEV MODE] Password reset email for {email}:")
@@ -140,6 +163,13 @@ class EmailService:
                 return True
             else:
                 # Production mode - send actual email
+                timestamp = datetime.now().strftime('%B %d, %Y at %I:%M %p UTC')
+                html_content = _PASSWORD_RESET_HTML_TEMPLATE.substitute(
+                    username=username, reset_url=reset_url, timestamp=timestamp
+                )
+                text_content = _PASSWORD_RESET_TEXT_TEMPLATE.substitute(
+                    username=username, reset_url=reset_url, timestamp=timestamp
+                )
                 return self._send_email(email, subject, text_content, html_content)
                 
         except Exception as e:
@@ -147,7 +177,7 @@ class EmailService:
             return False
     
     def _send_email(self, to_email: str, subject: str, text_content: str, html_content: str) -> bool:
-        """Send email via SMTP."""
+        """Queue an email for the background SMTP worker."""
         try:
             # Create multipart message
             message = MIMEMultipart("alternative")
@@ -162,19 +192,102 @@ class EmailService:
             message.attach(text_part)
             message.attach(html_part)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if not self.smtp_secure:
-                    server.starttls()  # Enable STARTTLS encryption
-                # No login required for IP-based authentication
-                server.send_message(message)
-            
-            logger.info(f"Password reset email sent successfully to {to_email}")
+            self._ensure_workers()
+            self._queue.put(message)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {str(e)}")
+            logger.error(f"Failed to queue email to {to_email}: {str(e)}")
             return False
+    
+    def _ensure_workers(self):
+        """Start (or restart) the background SMTP workers that are not running."""
+        with self._worker_lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            for i in range(len(self._workers), self.smtp_pool_size):
+                worker = threading.Thread(target=self._worker_loop, name=f"smtp-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+    
+    def _worker_loop(self):
+        """Send queued messages over this worker's SMTP connection until shutdown."""
+        while True:
+            try:
+                message = self._queue.get(timeout=self.smtp_idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            
+            if message is None:
+                self._disconnect()
+                self._queue.task_done()
+                return
+            
+            try:
+                self._deliver(message)
+                logger.info(f"Password reset email sent successfully to {message['To']}")
+            except Exception as e:
+                logger.error(f"Failed to send email to {message['To']}: {str(e)}")
+            finally:
+                self._queue.task_done()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open an SMTP connection for the calling worker."""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        if not self.smtp_secure:
+            server.starttls()  # Enable STARTTLS encryption
+        # No login required for IP-based authentication
+        return server
+    
+    def _disconnect(self):
+        """Close the calling worker's SMTP connection if one is open."""
+        server = getattr(self._local, "smtp", None)
+        if server is not None:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._local.smtp = None
+    
+    def _deliver(self, message: MIMEMultipart):
+        """Send a message, reconnecting once if the server dropped the connection."""
+        server = getattr(self._local, "smtp", None)
+        if server is None:
+            server = self._local.smtp = self._connect()
+        try:
+            server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            server = self._local.smtp = self._connect()
+            server.send_message(message)
+    
+    def close(self):
+        """Flush queued emails and stop the background workers, waiting at most SMTP_SHUTDOWN_TIMEOUT."""
+        with self._worker_lock:
+            workers = [worker for worker in self._workers if worker.is_alive()]
+            self._workers = []
+        for _ in workers:
+            self._queue.put(None)
+        deadline = time.monotonic() + self.smtp_shutdown_timeout
+        for worker in workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+        
+        # Workers are daemon threads, so a hung SMTP send no longer holds up shutdown;
+        # report whatever it left undelivered
+        stuck = sum(worker.is_alive() for worker in workers)
+        unsent = []
+        while True:
+            try:
+                message = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if message is not None:
+                unsent.append(message['To'])
+        if stuck:
+            logger.warning(f"{stuck} SMTP worker(s) still busy after {self.smtp_shutdown_timeout}s; shutting down without them")
+        if unsent:
+            logger.error(f"Shutting down with {len(unsent)} queued email(s) not sent: {', '.join(unsent)}")
 
 
 # Global email service instance
@@ -2,6 +2,9 @@
 
 class GPXAnalyzerException(Exception):
     """Base exception for GPX Analyzer application"""
+    # Slots keep message/details out of a per-instance __dict__; subclasses declare empty slots
+    __slots__ = ('message', 'details')
+    
     def __init__(self, message: str, details: str = None):
         self.message = message
         self.details = details
@@ -9,37 +12,34 @@ class GPXAnalyzerException(Exception):
 
 class DatabaseException(GPXAnalyzerException):
     """Raised when database operations fail"""
-    pass
+    __slots__ = ()
 
 # Alias for new naming convention
-class DatabaseError(DatabaseException):
-    """Raised when database operations fail (PostgreSQL version)"""
-    pass
+DatabaseError = DatabaseException
 
 class AuthenticationError(GPXAnalyzerException):
     """Raised when authentication fails"""
-    pass
+    __slots__ = ()
 
 class ValidationError(GPXAnalyzerException):
     """Raised when data validation fails (updated naming)"""
-    pass
+    __slots__ = ()
 
 class RouteNotFoundException(GPXAnalyzerException):
     """Raised when a requested route is not found"""
-    pass
+    __slots__ = ()
 
 class WaypointNotFoundException(GPXAnalyzerException):
     """Raised when a requested waypoint is not found"""
-    pass
+    __slots__ = ()
 
-class ValidationException(ValidationError):
-    """Raised when data validation fails (legacy naming)"""
-    pass
+# Alias for legacy naming
+ValidationException = ValidationError
 
 class FileProcessingException(GPXAnalyzerException):
     """Raised when file processing fails"""
-    pass
+    __slots__ = ()
 
 class ConfigurationException(GPXAnalyzerException):
     """Raised when there are configuration issues"""
-    pass 
\ No newline at end of file
+    __slots__ = () 
\ No newline at end of file
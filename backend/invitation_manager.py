@@ -5,82 +5,117 @@ Handles approved emails, admin users, and invitation controls
 
 import logging
 import secrets
-import string
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
 
-from database import get_db_connection
+from psycopg2.extras import execute_values
+
+from database import get_db_cursor, execute_prepared
 from auth import AuthenticationError
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class ApprovedEmail:
-    id: int
-    email: str
-    invited_by: str
-    invited_at: datetime
-    registered_at: Optional[datetime]
-    is_active: bool
-    notes: Optional[str]
-    invitation_token: Optional[str]
-    token_expires_at: Optional[datetime]
+# Invitation log queries, prepared once per database connection by execute_prepared
+_INVITATION_LOGS_QUERY = """
+    SELECT id, email, action, performed_by, performed_at, details
+    FROM invitation_logs
+    ORDER BY performed_at DESC
+    LIMIT $1
+"""
 
-@dataclass
-class InvitationLog:
-    id: int
-    email: str
-    action: str
-    performed_by: Optional[int]
-    performed_at: datetime
-    details: Optional[str]
+_INVITATION_LOGS_FOR_EMAIL_QUERY = """
+    SELECT id, email, action, performed_by, performed_at, details
+    FROM invitation_logs
+    WHERE email = $1
+    ORDER BY performed_at DESC
+    LIMIT $2
+"""
 
 class InvitationManager:
     """Manages email invitations and user approvals"""
     
     def __init__(self):
-        self.token_length = 32
+        self.token_length = 32  # bytes of randomness; the URL-safe token is ~43 characters
         self.default_token_expiry_days = 7
+        
+        # Short-lived in-process caches for the per-request permission checks. Changes made
+        # through this manager invalidate them immediately; changes from other processes are
+        # picked up once the entry expires.
+        self.cache_ttl_seconds = 30.0
+        self.cache_max_entries = 4096
+        self._admin_cache: Dict[int, Tuple[float, bool]] = {}
+        self._email_approved_cache: Dict[str, Tuple[float, bool]] = {}
+        self._cache_lock = threading.Lock()
+    
+    def _cache_get(self, cache: Dict[Any, Tuple[float, bool]], key: Any) -> Optional[bool]:
+        """Return a cached value if present and not expired."""
+        with self._cache_lock:
+            entry = cache.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.cache_ttl_seconds:
+            return None
+        return entry[1]
+    
+    def _cache_set(self, cache: Dict[Any, Tuple[float, bool]], key: Any, value: bool):
+        """Store a value, dropping all entries if the cache is full."""
+        with self._cache_lock:
+            if len(cache) >= self.cache_max_entries:
+                cache.clear()
+            cache[key] = (time.monotonic(), value)
+    
+    def _cache_invalidate(self, cache: Dict[Any, Tuple[float, bool]], key: Any):
+        """Remove a cached value after the underlying data changed."""
+        with self._cache_lock:
+            cache.pop(key, None)
     
     def generate_invitation_token(self) -> str:
         """Generate a secure random invitation token"""
-        alphabet = string.ascii_letters + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(self.token_length))
+        return secrets.token_urlsafe(self.token_length)
     
     def is_email_approved(self, email: str) -> bool:
         """Check if an email is approved for registration"""
+        cached = self._cache_get(self._email_approved_cache, email)
+        if cached is not None:
+            return cached
+        
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT is_email_approved(%s) as approved
+                """, (email,))
+                
+                result = cursor.fetchone()
             
-            cursor.execute("""
-                SELECT is_email_approved(%s) as approved
-            """, (email,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            return result['approved'] if result else False
+            approved = result['approved'] if result else False
+            self._cache_set(self._email_approved_cache, email, approved)
+            return approved
             
         except Exception as e:
             logger.error(f"Error checking email approval for {email}: {str(e)}")
             return False
     
+    def get_cached_admin_status(self, user_id: int) -> Optional[bool]:
+        """Return the cached admin flag for a user, or None when it must be looked up."""
+        return self._cache_get(self._admin_cache, user_id)
+    
     def is_user_admin(self, user_id: int) -> bool:
         """Check if a user is an admin"""
+        cached = self.get_cached_admin_status(user_id)
+        if cached is not None:
+            return cached
+        
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT is_user_admin(%s) as is_admin
+                """, (user_id,))
+                
+                result = cursor.fetchone()
             
-            cursor.execute("""
-                SELECT is_user_admin(%s) as is_admin
-            """, (user_id,))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            return result['is_admin'] if result else False
+            is_admin = result['is_admin'] if result else False
+            self._cache_set(self._admin_cache, user_id, is_admin)
+            return is_admin
             
         except Exception as e:
             logger.error(f"Error checking admin status for user {user_id}: {str(e)}")
@@ -90,9 +125,6 @@ class InvitationManager:
                           generate_token: bool = False, admin_user_id: int = None) -> Dict[str, Any]:
         """Add an email to the approved list"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
             # Generate token if requested
             invitation_token = None
             token_expires_at = None
@@ -100,25 +132,27 @@ class InvitationManager:
                 invitation_token = self.generate_invitation_token()
                 token_expires_at = datetime.now() + timedelta(days=self.default_token_expiry_days)
             
-            # Insert approved email
-            cursor.execute("""
-                INSERT INTO approved_emails 
-                (email, invited_by, notes, invitation_token, token_expires_at)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id, invited_at
-            """, (email, invited_by_email, notes, invitation_token, token_expires_at))
-            
-            result = cursor.fetchone()
-            approval_id = result['id']
-            invited_at = result['invited_at']
-            
-            # Log the action
-            cursor.execute("""
-                SELECT log_invitation_action(%s, %s, %s, %s)
-            """, (email, 'invited', admin_user_id, f"Added to approved list. Notes: {notes or 'None'}"))
-            
-            conn.commit()
-            conn.close()
+            with get_db_cursor() as cursor:
+                # Insert approved email and log the action in one statement
+                cursor.execute("""
+                    WITH ins AS (
+                        INSERT INTO approved_emails 
+                        (email, invited_by, notes, invitation_token, token_expires_at)
+                        VALUES (%s, %s, %s, %s, %s)
+                        RETURNING id, email, invited_at
+                    ), log AS (
+                        INSERT INTO invitation_logs (email, action, performed_by, details)
+                        SELECT email, 'invited', %s, %s FROM ins
+                    )
+                    SELECT id, invited_at FROM ins
+                """, (email, invited_by_email, notes, invitation_token, token_expires_at,
+                      admin_user_id, f"Added to approved list. Notes: {notes or 'None'}"))
+                
+                result = cursor.fetchone()
+                approval_id = result['id']
+                invited_at = result['invited_at']
+            
+            self._cache_invalidate(self._email_approved_cache, email)
             
             response_data = {
                 "id": approval_id,
@@ -139,32 +173,94 @@ class InvitationManager:
             logger.error(f"Error adding approved email {email}: {str(e)}")
             raise AuthenticationError(f"Failed to add approved email: {str(e)}")
     
+    def add_approved_emails_bulk(self, entries: List[Tuple[str, Optional[str]]], invited_by_email: str,
+                                 admin_user_id: int = None) -> Dict[str, Any]:
+        """
+        Add many emails to the approved list in one transaction.
+        
+        Rows are sent with execute_values, one statement per 1000 emails, and each
+        statement also writes the matching invitation_logs rows. Emails that are
+        already on the list (or repeated in the input) are skipped, not updated.
+        
+        Args:
+            entries: (email, notes) pairs
+            invited_by_email: Email of the approving admin
+            admin_user_id: User id of the approving admin, recorded in the log
+            
+        Returns:
+            Dictionary with the added rows and the skipped emails
+        """
+        rows = []
+        seen = set()
+        for email, notes in entries:
+            if email in seen:
+                continue
+            seen.add(email)
+            rows.append((email, invited_by_email, notes, admin_user_id,
+                         f"Added to approved list. Notes: {notes or 'None'}"))
+        
+        try:
+            with get_db_cursor() as cursor:
+                added = execute_values(cursor, """
+                    WITH input (email, invited_by, notes, performed_by, details) AS (
+                        VALUES %s
+                    ), ins AS (
+                        INSERT INTO approved_emails (email, invited_by, notes)
+                        SELECT email, invited_by, notes FROM input
+                        ON CONFLICT (email) DO NOTHING
+                        RETURNING id, email, invited_at
+                    ), log AS (
+                        INSERT INTO invitation_logs (email, action, performed_by, details)
+                        SELECT ins.email, 'invited', input.performed_by, input.details
+                        FROM ins JOIN input USING (email)
+                    )
+                    SELECT id, email, invited_at FROM ins
+                """, rows, template="(%s, %s, %s, %s::integer, %s)", page_size=1000, fetch=True)
+            
+            added_emails = set()
+            for row in added:
+                added_emails.add(row['email'])
+                self._cache_invalidate(self._email_approved_cache, row['email'])
+            
+            logger.info("Bulk approval by %s: %d added, %d skipped",
+                        invited_by_email, len(added), len(rows) - len(added))
+            return {
+                "added": [
+                    {"id": row['id'], "email": row['email'], "invited_at": row['invited_at'].isoformat()}
+                    for row in added
+                ],
+                "skipped": [row[0] for row in rows if row[0] not in added_emails],
+                "message": f"{len(added)} emails added to approved list"
+            }
+            
+        except Exception as e:
+            logger.error(f"Error bulk adding approved emails: {str(e)}")
+            raise AuthenticationError(f"Failed to add approved emails: {str(e)}")
+    
     def remove_approved_email(self, email: str, admin_user_id: int = None) -> Dict[str, str]:
         """Remove an email from the approved list"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Deactivate the email instead of deleting (for audit trail)
-            cursor.execute("""
-                UPDATE approved_emails 
-                SET is_active = FALSE 
-                WHERE email = %s AND is_active = TRUE
-                RETURNING id
-            """, (email,))
-            
-            result = cursor.fetchone()
+            with get_db_cursor() as cursor:
+                # Deactivate the email instead of deleting (for audit trail) and log the action
+                cursor.execute("""
+                    WITH upd AS (
+                        UPDATE approved_emails 
+                        SET is_active = FALSE 
+                        WHERE email = %s AND is_active = TRUE
+                        RETURNING id, email
+                    ), log AS (
+                        INSERT INTO invitation_logs (email, action, performed_by, details)
+                        SELECT email, 'revoked', %s, 'Removed from approved list' FROM upd
+                    )
+                    SELECT id FROM upd
+                """, (email, admin_user_id))
+                
+                result = cursor.fetchone()
+            
+            self._cache_invalidate(self._email_approved_cache, email)
             if not result:
                 raise AuthenticationError(f"Email {email} not found in approved list")
             
-            # Log the action
-            cursor.execute("""
-                SELECT log_invitation_action(%s, %s, %s, %s)
-            """, (email, 'revoked', admin_user_id, "Removed from approved list"))
-            
-            conn.commit()
-            conn.close()
-            
             return {"message": f"Email {email} removed from approved list"}
             
         except AuthenticationError:
@@ -173,15 +269,15 @@ class InvitationManager:
             logger.error(f"Error removing approved email {email}: {str(e)}")
             raise AuthenticationError(f"Failed to remove approved email: {str(e)}")
     
-    def get_approved_emails(self, include_inactive: bool = False) -> List[ApprovedEmail]:
-        """Get list of approved emails"""
+    def get_approved_emails(self, include_inactive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get list of approved emails.
+        
+        Rows are returned as fetched (dicts of the API fields) for the endpoint to serialize.
+        """
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
             query = """
-                SELECT id, email, invited_by, invited_at, registered_at, 
-                       is_active, notes, invitation_token, token_expires_at
+                SELECT id, email, invited_by, invited_at, registered_at, is_active, notes
                 FROM approved_emails
             """
             
@@ -190,24 +286,9 @@ class InvitationManager:
             
             query += " ORDER BY invited_at DESC"
             
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
-            
-            return [
-                ApprovedEmail(
-                    id=row['id'],
-                    email=row['email'],
-                    invited_by=row['invited_by'],
-                    invited_at=row['invited_at'],
-                    registered_at=row['registered_at'],
-                    is_active=row['is_active'],
-                    notes=row['notes'],
-                    invitation_token=row['invitation_token'],
-                    token_expires_at=row['token_expires_at']
-                )
-                for row in rows
-            ]
+            with get_db_cursor(autocommit=True) as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
             
         except Exception as e:
             logger.error(f"Error getting approved emails: {str(e)}")
@@ -216,39 +297,37 @@ class InvitationManager:
     def make_user_admin(self, user_id: int, granted_by_user_id: int) -> Dict[str, str]:
         """Grant admin privileges to a user"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Check if user exists
-            cursor.execute("""
-                SELECT id, email FROM users WHERE id = %s AND is_active = TRUE
-            """, (user_id,))
-            
-            user = cursor.fetchone()
+            with get_db_cursor() as cursor:
+                # Grant and log in one statement. admin_users.user_id is UNIQUE, so the upsert
+                # either inserts, reactivates a revoked grant, or returns nothing for an
+                # active admin - no separate existence check is needed
+                cursor.execute("""
+                    WITH u AS (
+                        SELECT id, email FROM users WHERE id = %s AND is_active = TRUE
+                    ), ins AS (
+                        INSERT INTO admin_users (user_id, granted_by)
+                        SELECT u.id, %s FROM u
+                        ON CONFLICT (user_id) DO UPDATE
+                        SET is_active = TRUE, granted_by = EXCLUDED.granted_by,
+                            granted_at = CURRENT_TIMESTAMP
+                        WHERE admin_users.is_active = FALSE
+                        RETURNING id
+                    ), log AS (
+                        INSERT INTO invitation_logs (email, action, performed_by, details)
+                        SELECT u.email, 'admin_granted', %s, 'User granted admin privileges'
+                        FROM u, ins
+                    )
+                    SELECT u.email, EXISTS (SELECT 1 FROM ins) as granted FROM u
+                """, (user_id, granted_by_user_id, granted_by_user_id))
+                
+                user = cursor.fetchone()
+            
+            self._cache_invalidate(self._admin_cache, user_id)
             if not user:
                 raise AuthenticationError(f"User with ID {user_id} not found")
-            
-            # Check if already admin
-            if self.is_user_admin(user_id):
+            if not user['granted']:
                 raise AuthenticationError(f"User {user['email']} is already an admin")
             
-            # Grant admin privileges
-            cursor.execute("""
-                INSERT INTO admin_users (user_id, granted_by)
-                VALUES (%s, %s)
-                RETURNING id
-            """, (user_id, granted_by_user_id))
-            
-            admin_id = cursor.fetchone()['id']
-            
-            # Log the action
-            cursor.execute("""
-                SELECT log_invitation_action(%s, %s, %s, %s)
-            """, (user['email'], 'admin_granted', granted_by_user_id, f"User granted admin privileges"))
-            
-            conn.commit()
-            conn.close()
-            
             return {"message": f"Admin privileges granted to {user['email']}"}
             
         except AuthenticationError:
@@ -260,38 +339,33 @@ class InvitationManager:
     def revoke_admin(self, user_id: int, revoked_by_user_id: int) -> Dict[str, str]:
         """Revoke admin privileges from a user"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get user info
-            cursor.execute("""
-                SELECT email FROM users WHERE id = %s
-            """, (user_id,))
-            
-            user = cursor.fetchone()
+            with get_db_cursor() as cursor:
+                # Revoke admin privileges and log the action in one statement
+                cursor.execute("""
+                    WITH u AS (
+                        SELECT id, email FROM users WHERE id = %s
+                    ), upd AS (
+                        UPDATE admin_users a 
+                        SET is_active = FALSE 
+                        FROM u
+                        WHERE a.user_id = u.id AND a.is_active = TRUE
+                        RETURNING a.id
+                    ), log AS (
+                        INSERT INTO invitation_logs (email, action, performed_by, details)
+                        SELECT u.email, 'admin_revoked', %s, 'Admin privileges revoked'
+                        FROM u, upd
+                    )
+                    SELECT u.email, EXISTS (SELECT 1 FROM upd) as revoked FROM u
+                """, (user_id, revoked_by_user_id))
+                
+                user = cursor.fetchone()
+            
+            self._cache_invalidate(self._admin_cache, user_id)
             if not user:
                 raise AuthenticationError(f"User with ID {user_id} not found")
-            
-            # Revoke admin privileges
-            cursor.execute("""
-                UPDATE admin_users 
-                SET is_active = FALSE 
-                WHERE user_id = %s AND is_active = TRUE
-                RETURNING id
-            """, (user_id,))
-            
-            result = cursor.fetchone()
-            if not result:
+            if not user['revoked']:
                 raise AuthenticationError(f"User {user['email']} is not an admin")
             
-            # Log the action
-            cursor.execute("""
-                SELECT log_invitation_action(%s, %s, %s, %s)
-            """, (user['email'], 'admin_revoked', revoked_by_user_id, "Admin privileges revoked"))
-            
-            conn.commit()
-            conn.close()
-            
             return {"message": f"Admin privileges revoked from {user['email']}"}
             
         except AuthenticationError:
@@ -300,42 +374,16 @@ class InvitationManager:
             logger.error(f"Error revoking admin privileges from user {user_id}: {str(e)}")
             raise AuthenticationError(f"Failed to revoke admin privileges: {str(e)}")
     
-    def get_invitation_logs(self, email: str = None, limit: int = 100) -> List[InvitationLog]:
-        """Get invitation action logs"""
+    def get_invitation_logs(self, email: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get invitation action logs as fetched rows, newest first"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            query = """
-                SELECT il.id, il.email, il.action, il.performed_by, 
-                       il.performed_at, il.details, u.username as performed_by_username
-                FROM invitation_logs il
-                LEFT JOIN users u ON il.performed_by = u.id
-            """
-            
-            params = []
-            if email:
-                query += " WHERE il.email = %s"
-                params.append(email)
-            
-            query += " ORDER BY il.performed_at DESC LIMIT %s"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            conn.close()
-            
-            return [
-                InvitationLog(
-                    id=row['id'],
-                    email=row['email'],
-                    action=row['action'],
-                    performed_by=row['performed_by'],
-                    performed_at=row['performed_at'],
-                    details=row['details']
-                )
-                for row in rows
-            ]
+            with get_db_cursor() as cursor:
+                if email:
+                    execute_prepared(cursor, "get_invitation_logs_for_email", (email, limit),
+                                     _INVITATION_LOGS_FOR_EMAIL_QUERY)
+                else:
+                    execute_prepared(cursor, "get_invitation_logs", (limit,), _INVITATION_LOGS_QUERY)
+                return cursor.fetchall()
             
         except Exception as e:
             logger.error(f"Error getting invitation logs: {str(e)}")
@@ -1,9 +1,31 @@
 import logging
 import logging.config
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 from datetime import datetime
 
+# Listeners that own the real (blocking) handlers; loggers only enqueue records
+_listeners = []
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that runs strftime once per second instead of once per record."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (second, formatted) kept as one tuple so the listener threads sharing this
+        # formatter never see a second paired with another second's string
+        self._cached_time = (None, '')
+    
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached = self._cached_time
+        if cached[0] != second:
+            cached = (second, super().formatTime(record, datefmt))
+            self._cached_time = cached
+        return cached[1]
+
 def setup_logging():
     """Setup logging configuration"""
     
@@ -14,63 +36,91 @@ def setup_logging():
     # Generate log filename with current date
     log_filename = logs_dir / f"gpx_analyzer_{datetime.now().strftime('%Y-%m-%d')}.log"
     
+    # Stop listeners from an earlier call so their handlers are flushed and closed
+    stop_logging()
+    
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+    
+    file_handler = logging.handlers.RotatingFileHandler(
+        str(log_filename),
+        maxBytes=10485760,  # 10MB
+        backupCount=5,
+        encoding='utf8'
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(CachedTimeFormatter(
+        '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    ))
+    
+    # Loggers write to in-memory queues; listener threads do the console/file I/O so
+    # request handlers never block on a write or a log rollover
+    console_and_file_queue = queue.Queue(-1)
+    file_queue = queue.Queue(-1)
+    
     logging_config = {
         'version': 1,
         'disable_existing_loggers': False,
-        'formatters': {
-            'detailed': {
-                'format': '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s',
-                'datefmt': '%Y-%m-%d %H:%M:%S'
-            },
-            'simple': {
-                'format': '%(levelname)s - %(message)s'
-            }
-        },
         'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-                'level': 'INFO',
-                'formatter': 'simple',
-                'stream': sys.stdout
+            'queue': {
+                'class': 'logging.handlers.QueueHandler',
+                'queue': console_and_file_queue
             },
-            'file': {
-                'class': 'logging.handlers.RotatingFileHandler',
-                'level': 'DEBUG',
-                'formatter': 'detailed',
-                'filename': str(log_filename),
-                'maxBytes': 10485760,  # 10MB
-                'backupCount': 5,
-                'encoding': 'utf8'
+            'file_queue': {
+                'class': 'logging.handlers.QueueHandler',
+                'queue': file_queue
             }
         },
         'loggers': {
             'gpx_analyzer': {
                 'level': 'DEBUG',
-                'handlers': ['console', 'file'],
+                'handlers': ['queue'],
                 'propagate': False
             },
             'uvicorn.access': {
                 'level': 'INFO',
-                'handlers': ['file'],
+                'handlers': ['file_queue'],
                 'propagate': False
             }
         },
         'root': {
             'level': 'INFO',
-            'handlers': ['console', 'file']
+            'handlers': ['queue']
         }
     }
     
     logging.config.dictConfig(logging_config)
     
+    _listeners.extend([
+        logging.handlers.QueueListener(
+            console_and_file_queue, console_handler, file_handler, respect_handler_level=True
+        ),
+        logging.handlers.QueueListener(file_queue, file_handler, respect_handler_level=True)
+    ])
+    for listener in _listeners:
+        listener.start()
+    
     # Get logger for the application
     logger = logging.getLogger('gpx_analyzer')
     logger.info("Logging system initialized")
     
     return logger
 
+def stop_logging():
+    """Flush queued log records and stop the listener threads. Called on shutdown."""
+    handlers = set()
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        handlers.update(listener.handlers)
+    # Close only after every listener has drained, since listeners share the file handler
+    for handler in handlers:
+        handler.close()
+
 def get_logger(name: str = None):
     """Get a logger instance with the specified name"""
     if name is None:
         name = 'gpx_analyzer'
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
@@ -1,105 +1,238 @@
-from fastapi import FastAPI, HTTPException, status, Request, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, status, Request, Depends, UploadFile, File, Path
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.openapi.utils import get_openapi
+from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import anyio
 import logging
 import time
-from pathlib import Path
+import orjson
+from decimal import Decimal
+from itertools import islice
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Annotated, Optional
 
 from database import (
-    init_database, save_route_data, get_user_routes, get_route_detail, 
+    init_database, close_db_connections, save_route_data, get_user_routes, get_route_detail, 
     delete_route, update_waypoint_notes, check_database_health,
-    create_waypoint, update_waypoint, delete_waypoint, get_route_waypoints,
-    update_route_data
+    create_waypoint, update_waypoint, delete_waypoint, get_route_waypoints_with_version,
+    get_route_version, update_route_data, DATABASE_POOL_SIZE
 )
 from models import (
     UserCreate, UserLogin, UserResponse, User, PasswordChange,
     PasswordResetRequest, PasswordResetConfirm,
     RouteCreate, RouteUpdate, WaypointCreate, WaypointUpdate,
     RouteData, RouteResponse, WaypointNotesUpdate, RouteListItem, RouteDetail,
-    GPXUploadResponse
+    GPXUploadResponse, ApproveEmailRequest, ApproveEmailsBulkRequest
 )
-from auth import auth_manager
+from auth import auth_manager, bearer_token
+from email_service import email_service
+from invitation_manager import invitation_manager
 from exceptions import (
     GPXAnalyzerException, DatabaseError, ValidationError, AuthenticationError,
     RouteNotFoundException, WaypointNotFoundException
 )
-from logging_config import setup_logging
-from api.race_analysis import router as race_analysis_router
+from logging_config import setup_logging, stop_logging
+from utils.gpx_processor import process_gpx_content
+from api.race_analysis import router as race_analysis_router, get_current_user as get_race_analysis_user
 
 # Initialize logging first
 logger = setup_logging()
 
-# Security scheme for JWT
-security = HTTPBearer()
+# Blocking handler work (database, password hashing, GPX parsing) runs on the
+# threadpool. Most of it holds a pooled database connection, so by default the
+# threadpool matches the pool; threads beyond it would only queue for a connection
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", str(DATABASE_POOL_SIZE)))
+
+# Processes for GPX parsing so large uploads don't hold the GIL other requests need;
+# 0 keeps parsing on the threadpool. Workers are spawned rather than forked: by the
+# time the first upload starts one, the log listener and threadpool threads are
+# running, and a forked child could inherit a lock one of them holds
+GPX_PROCESS_WORKERS = int(os.getenv("GPX_PROCESS_WORKERS", "0"))
+
+def _create_gpx_pool() -> Optional[ProcessPoolExecutor]:
+    """Create the GPX parsing process pool, or None when parsing stays on the threadpool."""
+    if GPX_PROCESS_WORKERS <= 0:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=GPX_PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     logger.info("Starting GPX Route Analyzer application")
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    app.state.gpx_pool = _create_gpx_pool()
     try:
         init_database()
         logger.info("Database initialization completed")
     except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
+        logger.error("Database initialization failed: %s", e)
         raise
+    # Build the OpenAPI schema now rather than on the first /docs or /openapi.json request
+    if app.openapi_url:
+        app.openapi()
     yield
     logger.info("Shutting down GPX Route Analyzer application")
+    if app.state.gpx_pool:
+        app.state.gpx_pool.shutdown(cancel_futures=True)
+    email_service.close()
+    close_db_connections()
+    stop_logging()
+
+# Interactive docs and the OpenAPI schema can be turned off where they are not exposed
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "1") == "1"
 
 # Initialize FastAPI app
 app = FastAPI(
     title="GPX Route Analyzer", 
     version="2.0.0",
     description="A production-grade multi-user GPX route analysis API with PostgreSQL",
+    default_response_class=ORJSONResponse,
+    openapi_url="/openapi.json" if API_DOCS_ENABLED else None,
     lifespan=lifespan
 )
 
+# Comma-separated origins allowed to call the API ("*" allows any origin)
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()]
+CORS_PATH_PREFIXES = ("/api", "/health")
+
+class ScopedCORSMiddleware(CORSMiddleware):
+    """CORS handling for API paths only; static files and docs bypass the header processing."""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(CORS_PATH_PREFIXES):
+            return await super().__call__(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+# Largest GPX upload accepted; checked against Content-Length before the body is read,
+# or counted while it is received when the upload is chunked
+MAX_GPX_UPLOAD_BYTES = int(os.getenv("MAX_GPX_UPLOAD_MB", "50")) * 1024 * 1024
+GPX_UPLOAD_PATH = "/api/routes/upload"
+GPX_UPLOAD_TOO_LARGE_DETAIL = f"GPX files are limited to {MAX_GPX_UPLOAD_BYTES // (1024 * 1024)} MB"
+
+def _upload_too_large_response() -> ORJSONResponse:
+    """413 response for an oversized GPX upload, whichever size check caught it."""
+    return ORJSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"error": "Upload too large", "detail": GPX_UPLOAD_TOO_LARGE_DETAIL}
+    )
+
+class _UploadTooLarge(HTTPException):
+    """
+    Raised from the body stream once a chunked upload crosses the limit. An
+    HTTPException subclass, so form parsing re-raises it rather than answering 400.
+    """
+    
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         detail=GPX_UPLOAD_TOO_LARGE_DETAIL)
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized GPX uploads before FastAPI spools the multipart body."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != GPX_UPLOAD_PATH:
+            return await self.app(scope, receive, send)
+        
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > MAX_GPX_UPLOAD_BYTES:
+                    return await _upload_too_large_response()(scope, receive, send)
+                # The server never delivers more than the declared length
+                return await self.app(scope, receive, send)
+        
+        # No Content-Length (chunked transfer): stop once the limit is crossed, so at
+        # most one chunk past it is ever spooled
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_GPX_UPLOAD_BYTES:
+                    raise _UploadTooLarge()
+            return message
+        
+        return await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify actual origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    ScopedCORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    # Auth uses a bearer header, not cookies. With a wildcard origin, leaving credentials
+    # off lets Starlette send a fixed "*" instead of echoing each request's Origin
+    allow_credentials="*" not in CORS_ORIGINS,
+    # Concrete lists are joined once at startup rather than echoed per preflight
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Include routers
 app.include_router(race_analysis_router)
 
+# The response line already carries method and URL, so the separate request line is opt-in
+LOG_REQUEST_START = os.getenv("LOG_REQUEST_START", "0") == "1"
+
+# Polled on every page load or by health checkers; successful responses on these
+# paths are logged at DEBUG so they don't crowd out the rest of the access log
+QUIET_LOG_PATHS = frozenset({"/health", "/api/auth/me"})
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all incoming requests and responses"""
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     
-    # Log request
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
+    # Log request - arguments are formatted only if a handler emits the record
+    if LOG_REQUEST_START:
+        logger.info("Request: %s %s", request.method, request.url)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", dict(request.headers))
     
     try:
         response = await call_next(request)
         
         # Log response
-        process_time = time.time() - start_time
-        logger.info(f"Response: {request.method} {request.url} - {response.status_code} - {process_time:.3f}s")
+        elapsed_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        level = logging.INFO
+        if response.status_code < 400 and request.url.path in QUIET_LOG_PATHS:
+            level = logging.DEBUG
+        logger.log(level, "Response: %s %s - %d - %dms", request.method, request.url, response.status_code, elapsed_ms)
         
         return response
     except Exception as e:
-        process_time = time.time() - start_time
-        logger.error(f"Request failed: {request.method} {request.url} - {str(e)} - {process_time:.3f}s")
+        elapsed_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+        logger.error("Request failed: %s %s - %s - %dms", request.method, request.url, e, elapsed_ms)
         raise
 
-# Authentication dependency
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+# Authentication dependency. The header is read directly rather than through an
+# HTTPBearer sub-dependency; the bearer scheme is added to the OpenAPI schema below
+async def get_current_user(request: Request) -> User:
     """Get current authenticated user from JWT token"""
+    token = bearer_token(request.headers.get("Authorization"))
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
     try:
-        token = credentials.credentials
-        user = auth_manager.get_current_user(token)
+        # Cache hits are answered on the event loop; only misses need the threadpool
+        user = auth_manager.get_cached_user(token)
+        if user is None:
+            user = await run_in_threadpool(auth_manager.get_current_user, token)
         return user
     except AuthenticationError as e:
         raise HTTPException(
@@ -111,129 +244,156 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 # Optional authentication dependency (for public routes)
 async def get_current_user_optional(request: Request) -> Optional[User]:
     """Get current user if authenticated, None otherwise"""
+    # Anonymous requests return before any token work
+    token = bearer_token(request.headers.get("Authorization"))
+    if token is None:
+        return None
+    
+    user = auth_manager.get_cached_user(token)
+    if user is not None:
+        return user
     try:
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return None
-        
-        token = auth_header.split(" ")[1]
-        return auth_manager.get_current_user(token)
+        return await run_in_threadpool(auth_manager.get_current_user, token)
     except:
         return None
 
-# Custom exception handlers
-@app.exception_handler(AuthenticationError)
-async def authentication_error_handler(request: Request, exc: AuthenticationError):
-    logger.warning(f"Authentication error: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        content={"error": "Authentication failed", "detail": exc.message},
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Shared dependency markers, created once and reused by every endpoint signature
+CurrentUser = Depends(get_current_user)
+OptionalUser = Depends(get_current_user_optional)
 
-@app.exception_handler(RouteNotFoundException)
-async def route_not_found_handler(request: Request, exc: RouteNotFoundException):
-    logger.warning(f"Route not found: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_404_NOT_FOUND,
-        content={"error": "Route not found", "detail": exc.message}
+def _requires_bearer_auth(dependant) -> bool:
+    """Whether a route's dependency tree includes one of the bearer-token dependencies."""
+    return any(
+        dep.call in (get_current_user, get_race_analysis_user) or _requires_bearer_auth(dep)
+        for dep in dependant.dependencies
     )
 
-@app.exception_handler(WaypointNotFoundException)
-async def waypoint_not_found_handler(request: Request, exc: WaypointNotFoundException):
-    logger.warning(f"Waypoint not found: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_404_NOT_FOUND,
-        content={"error": "Waypoint not found", "detail": exc.message}
-    )
+def custom_openapi():
+    """OpenAPI schema with the bearer scheme attached to every authenticated operation."""
+    if app.openapi_schema:
+        return app.openapi_schema
+    schema = get_openapi(title=app.title, version=app.version, description=app.description, routes=app.routes)
+    schema.setdefault("components", {})["securitySchemes"] = {"HTTPBearer": {"type": "http", "scheme": "bearer"}}
+    for route in app.routes:
+        if isinstance(route, APIRoute) and _requires_bearer_auth(route.dependant):
+            for method in route.methods:
+                operation = schema["paths"].get(route.path_format, {}).get(method.lower())
+                if operation is not None:
+                    operation["security"] = [{"HTTPBearer": []}]
+    app.openapi_schema = schema
+    return schema
 
-@app.exception_handler(DatabaseError)
-async def database_exception_handler(request: Request, exc: DatabaseError):
-    logger.error(f"Database error: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={"error": "Database error", "detail": "An internal database error occurred"}
-    )
+app.openapi = custom_openapi
 
-@app.exception_handler(ValidationError)
-async def validation_exception_handler(request: Request, exc: ValidationError):
-    logger.warning(f"Validation error: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"error": "Validation error", "detail": exc.message}
+# Custom exception handlers
+# Application errors map to (status code, error title, log level, log label, fixed body,
+# headers). A fixed body is the pre-encoded JSON for errors that never expose the exception
+# message; otherwise the message is sent as the detail. Built once at import
+_ERROR_RESPONSES = {
+    AuthenticationError: (status.HTTP_401_UNAUTHORIZED, "Authentication failed", logging.WARNING,
+                          "Authentication error", None, {"WWW-Authenticate": "Bearer"}),
+    RouteNotFoundException: (status.HTTP_404_NOT_FOUND, "Route not found", logging.WARNING,
+                             "Route not found", None, None),
+    WaypointNotFoundException: (status.HTTP_404_NOT_FOUND, "Waypoint not found", logging.WARNING,
+                                "Waypoint not found", None, None),
+    DatabaseError: (status.HTTP_500_INTERNAL_SERVER_ERROR, "Database error", logging.ERROR, "Database error",
+                    orjson.dumps({"error": "Database error", "detail": "An internal database error occurred"}),
+                    None),
+    ValidationError: (status.HTTP_422_UNPROCESSABLE_ENTITY, "Validation error", logging.WARNING,
+                      "Validation error", None, None),
+}
+_DEFAULT_ERROR_RESPONSE = (status.HTTP_500_INTERNAL_SERVER_ERROR, "Application error", logging.ERROR,
+                           "GPX Analyzer error", None, None)
+_UNHANDLED_ERROR_BODY = orjson.dumps({"error": "Internal server error", "detail": "An unexpected error occurred"})
+
+def _error_response_for(exc_type: type) -> tuple:
+    """Return the _ERROR_RESPONSES entry of the nearest mapped class in the exception's MRO."""
+    for cls in exc_type.__mro__:
+        entry = _ERROR_RESPONSES.get(cls)
+        if entry is not None:
+            return entry
+    return _DEFAULT_ERROR_RESPONSE
+
+@app.exception_handler(GPXAnalyzerException)
+async def gpx_exception_handler(request: Request, exc: GPXAnalyzerException):
+    status_code, error, level, log_label, body, headers = _error_response_for(type(exc))
+    logger.log(level, "%s: %s", log_label, exc.message)
+    if body is not None:
+        return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+    return ORJSONResponse(
+        status_code=status_code,
+        content={"error": error, "detail": exc.message},
+        headers=headers
     )
 
+@app.exception_handler(_UploadTooLarge)
+async def upload_too_large_handler(request: Request, exc: _UploadTooLarge):
+    return _upload_too_large_response()
+
 @app.exception_handler(RequestValidationError)
 async def validation_error_handler(request: Request, exc: RequestValidationError):
-    logger.warning(f"Request validation error: {exc.errors()}")
-    return JSONResponse(
+    logger.warning("Request validation error: %s", exc.errors())
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"error": "Request validation failed", "detail": exc.errors()}
     )
 
-@app.exception_handler(GPXAnalyzerException)
-async def gpx_exception_handler(request: Request, exc: GPXAnalyzerException):
-    logger.error(f"GPX Analyzer error: {exc.message}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={"error": "Application error", "detail": exc.message}
-    )
-
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.critical(f"Unhandled exception: {type(exc).__name__}: {str(exc)}", exc_info=True)
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={"error": "Internal server error", "detail": "An unexpected error occurred"}
-    )
+    # Traceback capture is the expensive part; it is kept whenever DEBUG logging is enabled
+    logger.critical("Unhandled exception: %s: %s", type(exc).__name__, exc,
+                    exc_info=logger.isEnabledFor(logging.DEBUG))
+    return Response(_UNHANDLED_ERROR_BODY, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    media_type="application/json")
 
 # Authentication Routes
 
 @app.post("/api/auth/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
     """Register a new user - requires approved email"""
-    logger.info(f"Registration attempt: {user_data.username}")
+    logger.info("Registration attempt: %s", user_data.username)
     try:
-        result = auth_manager.register_user(user_data)
-        logger.info(f"User registration successful: {user_data.username}")
+        result = await run_in_threadpool(auth_manager.register_user, user_data)
+        logger.info("User registration successful: %s", user_data.username)
         return UserResponse(**result)
     except (ValidationError, AuthenticationError) as e:
-        logger.warning(f"Registration failed for {user_data.username}: {str(e)}")
+        logger.warning("Registration failed for %s: %s", user_data.username, e)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
-@app.post("/api/auth/login", response_model=UserResponse)
+@app.post("/api/auth/login", responses={200: {"model": UserResponse}})
 async def login(login_data: UserLogin):
     """Authenticate user login"""
-    logger.info(f"Login attempt: {login_data.username_or_email}")
+    logger.info("Login attempt: %s", login_data.username_or_email)
     
     try:
-        result = auth_manager.login_user(login_data)
-        logger.info(f"User logged in successfully: {login_data.username_or_email}")
+        result = await run_in_threadpool(auth_manager.login_user, login_data)
+        logger.info("User logged in successfully: %s", login_data.username_or_email)
         return result
     except AuthenticationError:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error during login: {e}")
+        logger.error("Unexpected error during login: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Login failed"
         )
 
-@app.get("/api/auth/me", response_model=User)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+@app.get("/api/auth/me", responses={200: {"model": User}})
+async def get_current_user_info(current_user: User = CurrentUser):
     """Get current user information"""
     return current_user
 
 @app.post("/api/auth/change-password")
 async def change_password(
     password_data: PasswordChange,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Change user password"""
-    logger.info(f"Password change request for user: {current_user.username}")
+    logger.info("Password change request for user: %s", current_user.username)
     
     try:
-        success = auth_manager.change_password(
+        success = await run_in_threadpool(
+            auth_manager.change_password,
             current_user.id,
             password_data.current_password,
             password_data.new_password
@@ -249,7 +409,7 @@ async def change_password(
     except (ValidationError, AuthenticationError):
         raise
     except Exception as e:
-        logger.error(f"Unexpected error during password change: {e}")
+        logger.error("Unexpected error during password change: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Password change failed"
@@ -259,22 +419,22 @@ async def change_password(
 @app.post("/api/auth/request-password-reset")
 async def request_password_reset(reset_data: PasswordResetRequest):
     """Request password reset email"""
-    logger.info(f"Password reset requested for email: {reset_data.email}")
+    logger.info("Password reset requested for email: %s", reset_data.email)
     
     try:
-        success = auth_manager.request_password_reset(reset_data.email)
+        success = await run_in_threadpool(auth_manager.request_password_reset, reset_data.email)
         
         # Always return success for security (don't reveal if email exists)
         return {"message": "If the email address exists in our system, you will receive a password reset link shortly."}
         
     except ValidationError as e:
-        logger.warning(f"Password reset request validation failed: {str(e)}")
+        logger.warning("Password reset request validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Unexpected error during password reset request: {e}")
+        logger.error("Unexpected error during password reset request: %s", e)
         # Still return success for security
         return {"message": "If the email address exists in our system, you will receive a password reset link shortly."}
 
@@ -285,7 +445,7 @@ async def confirm_password_reset(reset_data: PasswordResetConfirm):
     logger.info("Password reset confirmation attempt")
     
     try:
-        success = auth_manager.confirm_password_reset(reset_data.token, reset_data.new_password)
+        success = await run_in_threadpool(auth_manager.confirm_password_reset, reset_data.token, reset_data.new_password)
         
         if success:
             return {"message": "Password reset successful. You can now log in with your new password."}
@@ -296,19 +456,19 @@ async def confirm_password_reset(reset_data: PasswordResetConfirm):
             )
             
     except ValidationError as e:
-        logger.warning(f"Password reset confirmation validation failed: {str(e)}")
+        logger.warning("Password reset confirmation validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e)
         )
     except AuthenticationError as e:
-        logger.warning(f"Password reset confirmation failed: {str(e)}")
+        logger.warning("Password reset confirmation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        logger.error(f"Unexpected error during password reset confirmation: {e}")
+        logger.error("Unexpected error during password reset confirmation: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Password reset failed"
@@ -316,39 +476,43 @@ async def confirm_password_reset(reset_data: PasswordResetConfirm):
 
 # Route Management API (Updated for Multi-user)
 
-@app.post("/api/routes/upload", response_model=GPXUploadResponse)
+@app.post("/api/routes/upload", responses={200: {"model": GPXUploadResponse}})
 async def upload_gpx_file(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Upload and process a GPX file"""
-    logger.info(f"GPX file upload for user {current_user.username}: {file.filename}")
+    logger.info("GPX file upload for user %s: %s", current_user.username, file.filename)
     
     if not file.filename:
         raise ValidationError("No file provided")
     
-    if not file.filename.lower().endswith('.gpx'):
+    if os.path.splitext(file.filename)[1].lower() != '.gpx':
         raise ValidationError("File must be a GPX file")
     
     try:
-        # Read file content
-        content = await file.read()
-        gpx_content = content.decode('utf-8')
-        
-        # Import GPX parsing utilities
-        from utils.gpx_processor import process_gpx_content
-        
-        # Process the GPX file
         start_time = time.time()
-        route_data = process_gpx_content(gpx_content, file.filename)
+        if app.state.gpx_pool:
+            # The upload is handed to the worker process as bytes
+            content = await file.read()
+            route_data = await asyncio.get_running_loop().run_in_executor(
+                app.state.gpx_pool, process_gpx_content, content, file.filename
+            )
+        else:
+            # Parse straight from the spooled upload; the XML declaration decides the encoding
+            route_data = await run_in_threadpool(process_gpx_content, file.file, file.filename)
         processing_time = time.time() - start_time
         
-        logger.info(f"GPX processing result: {len(route_data.get('trackPoints', []))} track points, {len(route_data.get('waypoints', []))} waypoints")
+        # GPX distances are always computed in meters
+        route_data['totalDistanceMeters'] = route_data['totalDistance']
+        
+        logger.info("GPX processing result: %s track points, %s waypoints",
+                    len(route_data.get('trackPoints', [])), len(route_data.get('waypoints', [])))
         
         # Save to database
-        route_id = save_route_data(current_user.id, route_data)
+        route_id = await run_in_threadpool(save_route_data, current_user.id, route_data)
         
-        logger.info(f"Successfully processed and saved GPX file {file.filename} as route {route_id}")
+        logger.info("Successfully processed and saved GPX file %s as route %s", file.filename, route_id)
         
         return GPXUploadResponse(
             route_id=route_id,
@@ -361,19 +525,19 @@ async def upload_gpx_file(
             processing_time_seconds=processing_time
         )
         
-    except ValidationError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Error processing GPX file {file.filename}: {e}")
-        raise GPXAnalyzerException(f"Failed to process GPX file: {str(e)}")
+        logger.error("Error processing GPX file %s: %s", file.filename, e)
+        raise GPXAnalyzerException(f"Failed to process GPX file: {str(e)}") from None
 
-@app.post("/api/routes", response_model=RouteResponse)
+@app.post("/api/routes", responses={200: {"model": RouteResponse}})
 async def create_route(
     route_data: RouteData,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Save a complete route with all data"""
-    logger.info(f"Creating new route for user {current_user.username}: {route_data.filename}")
+    logger.info("Creating new route for user %s: %s", current_user.username, route_data.filename)
     
     try:
         # Validate essential data
@@ -383,120 +547,185 @@ async def create_route(
         if route_data.totalDistance <= 0:
             raise ValidationError("Total distance must be greater than 0")
         
-        # Convert Pydantic model to dict
-        route_dict = route_data.model_dump()
+        # API clients send kilometres; older clients sent meters, which only a value above
+        # 1000 can be for a real route. The unit is settled here, once
+        distance = route_data.totalDistance
+        total_distance_meters = distance if distance > 1000 else distance * 1000
+        
+        # Track points go straight to the (lat, lon, elevation, distance) tuples the database
+        # layer stores, instead of being dumped to one dict per point first
+        route_dict = route_data.model_dump(exclude={'trackPoints'})
+        route_dict['trackPoints'] = [(p.lat, p.lon, p.elevation, p.distance) for p in route_data.trackPoints]
+        route_dict['totalDistanceMeters'] = total_distance_meters
         
         # Save to database with user association
-        route_id = save_route_data(current_user.id, route_dict)
+        route_id = await run_in_threadpool(save_route_data, current_user.id, route_dict)
         
-        logger.info(f"Successfully created route {route_id} for user {current_user.username}")
+        logger.info("Successfully created route %s for user %s", route_id, current_user.username)
         return RouteResponse(
             routeId=str(route_id),
             message="Route saved successfully"
         )
     
-    except ValidationError:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error creating route: {e}")
-        raise GPXAnalyzerException(f"Failed to create route: {str(e)}")
+        logger.error("Unexpected error creating route: %s", e)
+        raise GPXAnalyzerException(f"Failed to create route: {str(e)}") from None
 
 @app.get("/api/routes")
-async def get_all_routes(current_user: User = Depends(get_current_user)):
+async def get_all_routes(current_user: User = CurrentUser):
     """Get all routes for the current user"""
-    logger.debug(f"Retrieving routes for user {current_user.username}")
+    logger.debug("Retrieving routes for user %s", current_user.username)
     
     try:
-        routes = get_user_routes(current_user.id)
-        logger.info(f"Successfully retrieved {len(routes)} routes for user {current_user.username}")
-        return routes
+        routes = await run_in_threadpool(get_user_routes, current_user.id)
+        logger.info("Successfully retrieved %s routes for user %s", len(routes), current_user.username)
+        # The list is built by json_agg and holds only JSON-native values, so encode it
+        # directly instead of walking every route through jsonable_encoder first
+        return ORJSONResponse(routes)
     
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error retrieving routes: {e}")
-        raise GPXAnalyzerException(f"Failed to retrieve routes: {str(e)}")
+        logger.error("Unexpected error retrieving routes: %s", e)
+        raise GPXAnalyzerException(f"Failed to retrieve routes: {str(e)}") from None
+
+# Route and waypoint ids are SERIAL (int4) columns
+_MAX_ID = 2**31 - 1
+# Path ids are coerced and range-checked by FastAPI; bad ids get a 422 before the handler runs
+PathId = Annotated[int, Path(ge=1, le=_MAX_ID)]
+
+# Track points serialized per chunk when streaming a route detail response
+TRACK_POINT_CHUNK_SIZE = 1024
+
+def _json_default(obj):
+    """Serialize values orjson does not handle natively (NUMERIC columns)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+def _stream_route_detail(route_data: dict):
+    """
+    Encode a route detail as JSON, writing track points in chunks.
+    
+    The route and waypoints are encoded up front; track points are pulled from the
+    iterator returned by get_route_detail so the full array is never built.
+    """
+    track_points = route_data.pop('trackPoints')
+    yield orjson.dumps(route_data, default=_json_default)[:-1] + b',"trackPoints":['
+    
+    separator = b''
+    while True:
+        chunk = list(islice(track_points, TRACK_POINT_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield separator + orjson.dumps(chunk)[1:-1]
+        separator = b','
+    yield b']}'
+
+# Browsers keep route reads but revalidate them every time, so an edit is never served
+# stale; an unchanged route costs one version lookup and an empty 304
+ROUTE_CACHE_CONTROL = "private, no-cache"
+
+def _route_etag(route_id: int, version) -> str:
+    """Weak ETag for a route read, derived from the route's updated_at."""
+    return f'W/"{route_id}-{version:%Y%m%d%H%M%S%f}"'
+
+async def _route_not_modified(request: Request, route_id: int, user_id: Optional[int]) -> Optional[Response]:
+    """
+    Answer a conditional route read without loading the route.
+    
+    Args:
+        request: Incoming request, checked for If-None-Match
+        route_id: The route ID
+        user_id: The requesting user's ID, None for anonymous reads
+        
+    Returns:
+        A 304 response if the client's copy is current, otherwise None
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    version = await run_in_threadpool(get_route_version, route_id, user_id)
+    if version is None:
+        return None  # Let the full read produce the not-found response
+    etag = _route_etag(route_id, version)
+    if etag not in (tag.strip() for tag in if_none_match.split(",")):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": etag, "Cache-Control": ROUTE_CACHE_CONTROL})
 
 @app.get("/api/routes/{route_id}")
 async def get_route(
-    route_id: str,
-    current_user: User = Depends(get_current_user_optional)
+    route_id: PathId,
+    request: Request,
+    current_user: User = OptionalUser
 ):
     """Get a specific route with all data (supports public routes)"""
-    logger.debug(f"Retrieving route {route_id}")
+    logger.debug("Retrieving route %s", route_id)
     
     try:
-        # Validate route_id format
-        if not route_id or not route_id.isdigit():
-            raise ValidationError("Invalid route ID format")
-        
         user_id = current_user.id if current_user else None
-        route_data = get_route_detail(route_id, user_id or 0)
+        not_modified = await _route_not_modified(request, route_id, user_id)
+        if not_modified:
+            return not_modified
+        
+        route_data = await run_in_threadpool(get_route_detail, route_id, user_id or 0)
         
         if not route_data:
             raise RouteNotFoundException(f"Route {route_id} not found or not accessible")
         
-        logger.info(f"Successfully retrieved route {route_id}")
-        return route_data
+        logger.info("Successfully retrieved route %s", route_id)
+        headers = {"ETag": _route_etag(route_id, route_data.pop('updatedAt')),
+                   "Cache-Control": ROUTE_CACHE_CONTROL}
+        return StreamingResponse(_stream_route_detail(route_data), media_type="application/json",
+                                 headers=headers)
     
-    except ValidationError:
-        raise
-    except RouteNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error retrieving route {route_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to retrieve route: {str(e)}")
+        logger.error("Unexpected error retrieving route %s: %s", route_id, e)
+        raise GPXAnalyzerException(f"Failed to retrieve route: {str(e)}") from None
 
 @app.put("/api/routes/{route_id}")
 async def update_route(
-    route_id: str,
+    route_id: PathId,
     route_data: RouteUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Update an existing route"""
-    logger.info(f"Updating route {route_id} for user {current_user.username}")
+    logger.info("Updating route %s for user %s", route_id, current_user.username)
     
     try:
-        # Validate route_id format
-        if not route_id or not route_id.isdigit():
-            raise ValidationError("Invalid route ID format")
-        
         # Convert Pydantic model to dict, excluding None values
-        update_dict = {k: v for k, v in route_data.model_dump().items() if v is not None}
+        update_dict = route_data.model_dump(exclude_none=True)
         
         if not update_dict:
             raise ValidationError("No valid fields provided for update")
         
-        success = update_route_data(route_id, update_dict, current_user.id)
+        success = await run_in_threadpool(update_route_data, route_id, update_dict, current_user.id)
         
         if not success:
             raise RouteNotFoundException(f"Route {route_id} not found or not owned by user")
         
-        logger.info(f"Successfully updated route {route_id} for user {current_user.username}")
+        logger.info("Successfully updated route %s for user %s", route_id, current_user.username)
         return {"message": "Route updated successfully"}
     
-    except ValidationError:
-        raise
-    except RouteNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error updating route {route_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to update route: {str(e)}")
+        logger.error("Unexpected error updating route %s: %s", route_id, e)
+        raise GPXAnalyzerException(f"Failed to update route: {str(e)}") from None
 
 @app.put("/api/waypoints/{waypoint_id}/notes")
 async def update_waypoint_notes_endpoint(
-    waypoint_id: str,
+    waypoint_id: PathId,
     notes_update: WaypointNotesUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Update waypoint notes"""
-    logger.info(f"Updating notes for waypoint {waypoint_id} by user {current_user.username}")
+    logger.info("Updating notes for waypoint %s by user %s", waypoint_id, current_user.username)
     
     try:
         # For backward compatibility, we need route_id - this would need to be updated
@@ -504,334 +733,319 @@ async def update_waypoint_notes_endpoint(
         
         # For now, let's extract route info from the waypoint
         # This is a temporary solution - the API should be redesigned
-        if not waypoint_id or not waypoint_id.isdigit():
-            raise ValidationError("Invalid waypoint ID format")
-        
         # We'll implement a helper function to get route_id from waypoint_id
         # For now, returning success for backward compatibility
         logger.warning("Waypoint notes update needs route_id - this needs frontend update")
         
         return {"message": "Waypoint notes updated successfully"}
     
-    except ValidationError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error updating waypoint {waypoint_id} notes: {e}")
-        raise GPXAnalyzerException(f"Failed to update waypoint notes: {str(e)}")
+        logger.error("Unexpected error updating waypoint %s notes: %s", waypoint_id, e)
+        raise GPXAnalyzerException(f"Failed to update waypoint notes: {str(e)}") from None
 
 @app.get("/api/routes/{route_id}/waypoints")
 async def get_route_waypoints_endpoint(
-    route_id: str,
-    current_user: User = Depends(get_current_user_optional)
+    route_id: PathId,
+    request: Request,
+    current_user: User = OptionalUser
 ):
     """Get all waypoints for a route"""
-    logger.debug(f"Getting waypoints for route {route_id}")
+    logger.debug("Getting waypoints for route %s", route_id)
     
     try:
-        if not route_id or not route_id.isdigit():
-            raise ValidationError("Invalid route ID format")
-        
         user_id = current_user.id if current_user else None
-        waypoints = get_route_waypoints(int(route_id), user_id)
+        not_modified = await _route_not_modified(request, route_id, user_id)
+        if not_modified:
+            return not_modified
+        
+        version, waypoints = await run_in_threadpool(get_route_waypoints_with_version, route_id, user_id)
         
-        logger.info(f"Successfully retrieved {len(waypoints)} waypoints for route {route_id}")
-        return waypoints
+        logger.info("Successfully retrieved %s waypoints for route %s", len(waypoints), route_id)
+        if version is None:
+            return waypoints
+        return Response(orjson.dumps(waypoints, default=_json_default), media_type="application/json",
+                        headers={"ETag": _route_etag(route_id, version), "Cache-Control": ROUTE_CACHE_CONTROL})
     
-    except ValidationError:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error getting waypoints for route {route_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to get route waypoints: {str(e)}")
+        logger.error("Unexpected error getting waypoints for route %s: %s", route_id, e)
+        raise GPXAnalyzerException(f"Failed to get route waypoints: {str(e)}") from None
 
 @app.post("/api/routes/{route_id}/waypoints")
 async def create_waypoint_endpoint(
-    route_id: str,
+    route_id: PathId,
     waypoint_data: WaypointCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Create a new waypoint for a route"""
-    logger.info(f"Creating waypoint for route {route_id} by user {current_user.username}")
+    logger.info("Creating waypoint for route %s by user %s", route_id, current_user.username)
     
     try:
-        if not route_id or not route_id.isdigit():
-            raise ValidationError("Invalid route ID format")
-        
         # Convert Pydantic model to dict
         waypoint_dict = waypoint_data.model_dump()
         
-        waypoint_id = create_waypoint(int(route_id), waypoint_dict, current_user.id)
+        waypoint_id = await run_in_threadpool(create_waypoint, route_id, waypoint_dict, current_user.id)
         
         if not waypoint_id:
             raise RouteNotFoundException(f"Route {route_id} not found or not accessible")
         
-        logger.info(f"Successfully created waypoint {waypoint_id} for route {route_id}")
+        logger.info("Successfully created waypoint %s for route %s", waypoint_id, route_id)
         return {"waypoint_id": waypoint_id, "message": "Waypoint created successfully"}
     
-    except ValidationError:
-        raise
-    except RouteNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error creating waypoint for route {route_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to create waypoint: {str(e)}")
+        logger.error("Unexpected error creating waypoint for route %s: %s", route_id, e)
+        raise GPXAnalyzerException(f"Failed to create waypoint: {str(e)}") from None
 
 @app.put("/api/waypoints/{waypoint_id}")
 async def update_waypoint_endpoint(
-    waypoint_id: str,
+    waypoint_id: PathId,
     waypoint_data: WaypointUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = CurrentUser
 ):
     """Update an existing waypoint"""
-    logger.info(f"Updating waypoint {waypoint_id} by user {current_user.username}")
+    logger.info("Updating waypoint %s by user %s", waypoint_id, current_user.username)
     
     try:
-        if not waypoint_id or not waypoint_id.isdigit():
-            raise ValidationError("Invalid waypoint ID format")
-        
         # Convert Pydantic model to dict, excluding None values
-        waypoint_dict = {k: v for k, v in waypoint_data.model_dump().items() if v is not None}
+        waypoint_dict = waypoint_data.model_dump(exclude_none=True)
         
         if not waypoint_dict:
             raise ValidationError("No valid fields provided for update")
         
-        success = update_waypoint(int(waypoint_id), waypoint_dict, current_user.id)
+        success = await run_in_threadpool(update_waypoint, waypoint_id, waypoint_dict, current_user.id)
         
         if not success:
             raise WaypointNotFoundException(f"Waypoint {waypoint_id} not found or not accessible")
         
-        logger.info(f"Successfully updated waypoint {waypoint_id}")
+        logger.info("Successfully updated waypoint %s", waypoint_id)
         return {"message": "Waypoint updated successfully"}
     
-    except ValidationError:
-        raise
-    except WaypointNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error updating waypoint {waypoint_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to update waypoint: {str(e)}")
+        logger.error("Unexpected error updating waypoint %s: %s", waypoint_id, e)
+        raise GPXAnalyzerException(f"Failed to update waypoint: {str(e)}") from None
 
 @app.delete("/api/waypoints/{waypoint_id}")
 async def delete_waypoint_endpoint(
-    waypoint_id: str,
-    current_user: User = Depends(get_current_user)
+    waypoint_id: PathId,
+    current_user: User = CurrentUser
 ):
     """Delete a waypoint"""
-    logger.info(f"Deleting waypoint {waypoint_id} by user {current_user.username}")
+    logger.info("Deleting waypoint %s by user %s", waypoint_id, current_user.username)
     
     try:
-        if not waypoint_id or not waypoint_id.isdigit():
-            raise ValidationError("Invalid waypoint ID format")
-        
-        success = delete_waypoint(int(waypoint_id), current_user.id)
+        success = await run_in_threadpool(delete_waypoint, waypoint_id, current_user.id)
         
         if not success:
             raise WaypointNotFoundException(f"Waypoint {waypoint_id} not found or not accessible")
         
-        logger.info(f"Successfully deleted waypoint {waypoint_id}")
+        logger.info("Successfully deleted waypoint %s", waypoint_id)
         return {"message": "Waypoint deleted successfully"}
     
-    except ValidationError:
-        raise
-    except WaypointNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error deleting waypoint {waypoint_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to delete waypoint: {str(e)}")
+        logger.error("Unexpected error deleting waypoint %s: %s", waypoint_id, e)
+        raise GPXAnalyzerException(f"Failed to delete waypoint: {str(e)}") from None
 
 @app.delete("/api/routes/{route_id}")
 async def delete_route_endpoint(
-    route_id: str,
-    current_user: User = Depends(get_current_user)
+    route_id: PathId,
+    current_user: User = CurrentUser
 ):
     """Delete a route"""
-    logger.info(f"Deleting route {route_id} for user {current_user.username}")
+    logger.info("Deleting route %s for user %s", route_id, current_user.username)
     
     try:
-        # Validate route_id format
-        if not route_id or not route_id.isdigit():
-            raise ValidationError("Invalid route ID format")
-        
-        success = delete_route(route_id, current_user.id)
+        success = await run_in_threadpool(delete_route, route_id, current_user.id)
         
         if not success:
             raise RouteNotFoundException(f"Route {route_id} not found or not owned by user")
         
-        logger.info(f"Successfully deleted route {route_id} for user {current_user.username}")
+        logger.info("Successfully deleted route %s for user %s", route_id, current_user.username)
         return {"message": "Route deleted successfully"}
     
-    except ValidationError:
-        raise
-    except RouteNotFoundException:
-        raise
-    except DatabaseError:
+    except GPXAnalyzerException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error deleting route {route_id}: {e}")
-        raise GPXAnalyzerException(f"Failed to delete route: {str(e)}")
+        logger.error("Unexpected error deleting route %s: %s", route_id, e)
+        raise GPXAnalyzerException(f"Failed to delete route: {str(e)}") from None
 
 # Admin/Invitation Management Routes
+# InvitationManager uses the blocking psycopg2 driver, so its calls run in the threadpool
+# to keep the event loop free while they wait on the database
 
-async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_admin_user(current_user: User = CurrentUser) -> User:
     """Dependency to check if current user is admin"""
-    from invitation_manager import invitation_manager
-    
-    if not invitation_manager.is_user_admin(current_user.id):
+    # Cache hits are answered on the event loop; only a miss needs a database query
+    is_admin = invitation_manager.get_cached_admin_status(current_user.id)
+    if is_admin is None:
+        is_admin = await run_in_threadpool(invitation_manager.is_user_admin, current_user.id)
+    if not is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin privileges required"
         )
     return current_user
 
+AdminUser = Depends(get_admin_user)
+
 @app.post("/api/admin/approve-email")
 async def approve_email_for_registration(
-    email_data: dict,
-    admin_user: User = Depends(get_admin_user)
+    email_data: ApproveEmailRequest,
+    admin_user: User = AdminUser
 ):
     """Approve an email address for registration"""
-    from invitation_manager import invitation_manager
-    
-    logger.info(f"Admin {admin_user.username} approving email for registration")
+    logger.info("Admin %s approving email for registration", admin_user.username)
     
     try:
-        email = email_data.get("email", "").strip()
-        notes = email_data.get("notes", "")
-        
-        if not email or "@" not in email:
-            raise ValidationError("Invalid email address")
+        email = email_data.email
         
-        result = invitation_manager.add_approved_email(
+        result = await run_in_threadpool(
+            invitation_manager.add_approved_email,
             email=email,
             invited_by_email=admin_user.email,
-            notes=notes,
+            notes=email_data.notes,
             admin_user_id=admin_user.id
         )
         
-        logger.info(f"Email {email} approved for registration by {admin_user.username}")
+        logger.info("Email %s approved for registration by %s", email, admin_user.username)
         return result
         
     except ValidationError:
         raise
     except Exception as e:
-        logger.error(f"Error approving email: {e}")
+        logger.error("Error approving email: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@app.post("/api/admin/approve-emails")
+async def approve_emails_bulk(
+    email_data: ApproveEmailsBulkRequest,
+    admin_user: User = AdminUser
+):
+    """Approve a batch of email addresses (e.g. a CSV import) for registration"""
+    logger.info("Admin %s approving %s emails for registration", admin_user.username, len(email_data.emails))
+    
+    try:
+        pairs = [
+            (entry, "") if isinstance(entry, str) else (entry.email, entry.notes)
+            for entry in email_data.emails
+        ]
+        
+        return await run_in_threadpool(
+            invitation_manager.add_approved_emails_bulk,
+            pairs,
+            invited_by_email=admin_user.email,
+            admin_user_id=admin_user.id
+        )
+        
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error("Error approving emails: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @app.delete("/api/admin/revoke-email/{email}")
 async def revoke_email_approval(
     email: str,
-    admin_user: User = Depends(get_admin_user)
+    admin_user: User = AdminUser
 ):
     """Revoke email approval"""
-    from invitation_manager import invitation_manager
-    
-    logger.info(f"Admin {admin_user.username} revoking email approval for {email}")
+    logger.info("Admin %s revoking email approval for %s", admin_user.username, email)
     
     try:
-        result = invitation_manager.remove_approved_email(email, admin_user.id)
-        logger.info(f"Email approval revoked for {email} by {admin_user.username}")
+        result = await run_in_threadpool(invitation_manager.remove_approved_email, email, admin_user.id)
+        logger.info("Email approval revoked for %s by %s", email, admin_user.username)
         return result
         
     except Exception as e:
-        logger.error(f"Error revoking email approval: {e}")
+        logger.error("Error revoking email approval: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @app.get("/api/admin/approved-emails")
 async def get_approved_emails(
     include_inactive: bool = False,
-    admin_user: User = Depends(get_admin_user)
+    admin_user: User = AdminUser
 ):
     """Get list of approved emails"""
-    from invitation_manager import invitation_manager
-    
-    logger.info(f"Admin {admin_user.username} requesting approved emails list")
+    logger.info("Admin %s requesting approved emails list", admin_user.username)
     
     try:
-        approved_emails = invitation_manager.get_approved_emails(include_inactive)
-        
-        return {
-            "approved_emails": [
-                {
-                    "id": email.id,
-                    "email": email.email,
-                    "invited_by": email.invited_by,
-                    "invited_at": email.invited_at.isoformat(),
-                    "registered_at": email.registered_at.isoformat() if email.registered_at else None,
-                    "is_active": email.is_active,
-                    "notes": email.notes
-                }
-                for email in approved_emails
-            ]
-        }
+        approved_emails = await run_in_threadpool(invitation_manager.get_approved_emails, include_inactive)
+        
+        # Rows are plain dicts of the response fields; FastAPI encodes the datetimes
+        return {"approved_emails": approved_emails}
         
     except Exception as e:
-        logger.error(f"Error getting approved emails: {e}")
+        logger.error("Error getting approved emails: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @app.post("/api/admin/make-admin/{user_id}")
 async def make_user_admin(
     user_id: int,
-    admin_user: User = Depends(get_admin_user)
+    admin_user: User = AdminUser
 ):
     """Grant admin privileges to a user"""
-    from invitation_manager import invitation_manager
-    
-    logger.info(f"Admin {admin_user.username} granting admin privileges to user {user_id}")
+    logger.info("Admin %s granting admin privileges to user %s", admin_user.username, user_id)
     
     try:
-        result = invitation_manager.make_user_admin(user_id, admin_user.id)
-        logger.info(f"Admin privileges granted to user {user_id} by {admin_user.username}")
+        result = await run_in_threadpool(invitation_manager.make_user_admin, user_id, admin_user.id)
+        logger.info("Admin privileges granted to user %s by %s", user_id, admin_user.username)
         return result
         
     except Exception as e:
-        logger.error(f"Error granting admin privileges: {e}")
+        logger.error("Error granting admin privileges: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @app.get("/api/admin/invitation-logs")
 async def get_invitation_logs(
     email: str = None,
     limit: int = 100,
-    admin_user: User = Depends(get_admin_user)
+    admin_user: User = AdminUser
 ):
     """Get invitation action logs"""
-    from invitation_manager import invitation_manager
-    
-    logger.info(f"Admin {admin_user.username} requesting invitation logs")
+    logger.info("Admin %s requesting invitation logs", admin_user.username)
     
     try:
-        logs = invitation_manager.get_invitation_logs(email, limit)
-        
-        return {
-            "logs": [
-                {
-                    "id": log.id,
-                    "email": log.email,
-                    "action": log.action,
-                    "performed_by": log.performed_by,
-                    "performed_at": log.performed_at.isoformat(),
-                    "details": log.details
-                }
-                for log in logs
-            ]
-        }
+        logs = await run_in_threadpool(invitation_manager.get_invitation_logs, email, limit)
+        
+        # Rows hold only str/int/datetime/JSON values, which orjson encodes natively,
+        # so skip the jsonable_encoder walk over every row
+        return ORJSONResponse({"logs": logs})
         
     except Exception as e:
-        logger.error(f"Error getting invitation logs: {e}")
+        logger.error("Error getting invitation logs: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+# Probes arriving within this window share one database check; the lock makes
+# concurrent probes wait for the check in flight instead of starting their own
+HEALTH_CACHE_SECONDS = 1.0
+_health_cache = {"checked_at": 0.0, "db_health": None}
+_health_lock = asyncio.Lock()
+
+async def _get_database_health():
+    """Return the database health, re-checking at most once per HEALTH_CACHE_SECONDS."""
+    if time.monotonic() - _health_cache["checked_at"] < HEALTH_CACHE_SECONDS:
+        return _health_cache["db_health"]
+    async with _health_lock:
+        if time.monotonic() - _health_cache["checked_at"] >= HEALTH_CACHE_SECONDS:
+            _health_cache["db_health"] = await run_in_threadpool(check_database_health)
+            _health_cache["checked_at"] = time.monotonic()
+        return _health_cache["db_health"]
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     logger.debug("Health check requested")
     
     try:
-        db_health = check_database_health()
+        db_health = await _get_database_health()
         
         health_status = {
             "status": "healthy",
@@ -848,32 +1062,62 @@ async def health_check():
         if db_health["status"] != "healthy":
             health_status["status"] = "unhealthy"
             
-        return health_status
+        return ORJSONResponse(health_status)
     
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {
+        logger.error("Health check failed: %s", e)
+        return ORJSONResponse({
             "status": "unhealthy",
             "error": str(e),
             "version": "2.0.0"
-        }
+        })
+
+# The React build puts content-hashed assets under static/js, static/css and static/media
+# (served as /static/js/... and so on). Everything else keeps a stable name
+_HASHED_ASSET_DIRS = ("js", "css", "media")
+
+class CachedStaticFiles(StaticFiles):
+    """Static files with long-lived client caching for hashed build assets."""
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        # Only hashed assets can be cached for good; index.html, manifest.json, favicon.ico
+        # and asset-manifest.json change in place and must be revalidated
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if relative_path.split("/", 1)[0] in _HASHED_ASSET_DIRS:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
-# Static file serving (for frontend)
+# Static file serving (for frontend). In the Docker deployment nginx serves these
+# files itself (see frontend/nginx.conf), so this mount only handles local runs
 if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", CachedStaticFiles(directory="static", html=True), name="static")
 
 # Root redirect to health check for now
+# Uptime monitors poll the root endpoint; its body never changes, so encode it once
+# It only links the docs when they are served
+_ROOT_BODY = orjson.dumps({
+    "message": "GPX Route Analyzer API v2.0",
+    **({"docs": app.docs_url} if API_DOCS_ENABLED else {}),
+    "health": "/health",
+})
+
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {"message": "GPX Route Analyzer API v2.0", "docs": "/docs", "health": "/health"}
+    return Response(_ROOT_BODY, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting development server")
     uvicorn.run(
-        app, 
-        host="0.0.0.0", 
+        "main:app",
+        host="0.0.0.0",
         port=3000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
         log_level="info"
     ) 
\ No newline at end of file
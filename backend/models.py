@@ -3,7 +3,7 @@ Pydantic models for request/response validation and data serialization.
 """
 
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 
 
@@ -56,6 +56,19 @@ class PasswordResetConfirm(BaseModel):
     new_password: str = Field(..., min_length=8, description="New password (minimum 8 characters)")
 
 
+class ApproveEmailRequest(BaseModel):
+    """Model for approving an email address for registration."""
+    email: EmailStr = Field(..., description="Email address to approve")
+    notes: str = Field("", description="Admin notes about the invitation")
+
+
+class ApproveEmailsBulkRequest(BaseModel):
+    """Model for approving a batch of email addresses, e.g. from a CSV import."""
+    emails: List[Union[EmailStr, ApproveEmailRequest]] = Field(
+        ..., min_length=1, description="Email addresses, or objects with an email and notes"
+    )
+
+
 # Route and GPX Models (Updated for Multi-user)
 class RouteCreate(BaseModel):
     """Model for creating a new route."""
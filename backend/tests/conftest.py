@@ -22,6 +22,16 @@ def test_db():
     # The test database should be set up via environment variables
     yield database
 
+@pytest.fixture
+def mock_db_connect():
+    """Patch psycopg2.connect with a mock connection, starting and ending with an empty pool"""
+    database.close_db_connections()
+    with patch('database.psycopg2.connect') as mock_connect:
+        mock_connect.return_value.closed = 0
+        mock_connect.return_value.cursor.return_value.connection = mock_connect.return_value
+        yield mock_connect
+        database.close_db_connections()
+
 @pytest.fixture
 def test_user():
     """Create a test user for testing"""
@@ -161,8 +161,9 @@ class TestAPIEndpoints:
         
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
         data = response.json()
-        assert data["error"] == "Validation error"
-        assert "Invalid route ID format" in data["detail"]
+        assert data["error"] == "Request validation failed"
+        assert data["detail"][0]["loc"] == ["path", "route_id"]
+        assert data["detail"][0]["type"] == "int_parsing"
 
     def test_get_route_by_id_not_found(self, client):
         """Test getting non-existent route"""
@@ -208,8 +209,9 @@ class TestAPIEndpoints:
         
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
         data = response.json()
-        assert data["error"] == "Validation error"
-        assert "Invalid waypoint ID format" in data["detail"]
+        assert data["error"] == "Request validation failed"
+        assert data["detail"][0]["loc"] == ["path", "waypoint_id"]
+        assert data["detail"][0]["type"] == "int_parsing"
 
     def test_update_waypoint_notes_too_long(self, client):
         """Test updating waypoint with notes too long"""
@@ -265,8 +267,9 @@ class TestAPIEndpoints:
         
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
         data = response.json()
-        assert data["error"] == "Validation error"
-        assert "Invalid route ID format" in data["detail"]
+        assert data["error"] == "Request validation failed"
+        assert data["detail"][0]["loc"] == ["path", "route_id"]
+        assert data["detail"][0]["type"] == "int_parsing"
 
     def test_delete_route_not_found(self, client):
         """Test deleting non-existent route"""
@@ -316,4 +319,14 @@ class TestAPIEndpoints:
         response = client.get("/")
         
         # Should either serve the file or return 404 if not found
-        assert response.status_code in [200, 404] 
\ No newline at end of file
+        assert response.status_code in [200, 404] 
+
+    def test_error_response_inherited_by_subclasses(self):
+        """Test application error subclasses get their nearest mapped parent's status"""
+        from main import _error_response_for
+        
+        class StaleRouteError(RouteNotFoundException):
+            pass
+        
+        assert _error_response_for(StaleRouteError)[0] == status.HTTP_404_NOT_FOUND
+        assert _error_response_for(DatabaseException)[0] == status.HTTP_500_INTERNAL_SERVER_ERROR
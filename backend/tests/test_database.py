@@ -55,7 +55,7 @@ class TestDatabaseFunctions:
         user_id = test_user
         minimal_data = {
             'name': 'Test Route',
-            'totalDistance': 5.0,
+            'totalDistanceMeters': 5000.0,
             'totalElevationGain': 100.0
         }
         
@@ -116,7 +116,7 @@ class TestDatabaseFunctions:
         """Test creating waypoint successfully"""
         user_id = test_user
         # First create a route
-        route_data = {'name': 'Test Route', 'totalDistance': 5.0}
+        route_data = {'name': 'Test Route', 'totalDistanceMeters': 5000.0}
         route_id = database.save_route_data(user_id, route_data)
         
         waypoint_id = database.create_waypoint(route_id, sample_waypoint_data, user_id)
@@ -129,7 +129,7 @@ class TestDatabaseFunctions:
         """Test updating waypoint successfully"""
         user_id = test_user
         # Create route and waypoint
-        route_data = {'name': 'Test Route', 'totalDistance': 5.0, 'waypoints': [sample_waypoint_data]}
+        route_data = {'name': 'Test Route', 'totalDistanceMeters': 5000.0, 'waypoints': [sample_waypoint_data]}
         route_id = database.save_route_data(user_id, route_data)
         
         # Get waypoint ID
@@ -147,7 +147,7 @@ class TestDatabaseFunctions:
         """Test deleting waypoint successfully"""
         user_id = test_user
         # Create route and waypoint
-        route_data = {'name': 'Test Route', 'totalDistance': 5.0, 'waypoints': [sample_waypoint_data]}
+        route_data = {'name': 'Test Route', 'totalDistanceMeters': 5000.0, 'waypoints': [sample_waypoint_data]}
         route_id = database.save_route_data(user_id, route_data)
         
         # Get waypoint ID
@@ -164,7 +164,7 @@ class TestDatabaseFunctions:
         """Test updating waypoint notes successfully"""
         user_id = test_user
         # Create route and waypoint
-        route_data = {'name': 'Test Route', 'totalDistance': 5.0, 'waypoints': [sample_waypoint_data]}
+        route_data = {'name': 'Test Route', 'totalDistanceMeters': 5000.0, 'waypoints': [sample_waypoint_data]}
         route_id = database.save_route_data(user_id, route_data)
         
         # Get waypoint ID
@@ -182,7 +182,7 @@ class TestDatabaseFunctions:
         """Test getting route waypoints successfully"""
         user_id = test_user
         # Create route with waypoints
-        route_data = {'name': 'Test Route', 'totalDistance': 5.0, 'waypoints': [sample_waypoint_data]}
+        route_data = {'name': 'Test Route', 'totalDistanceMeters': 5000.0, 'waypoints': [sample_waypoint_data]}
         route_id = database.save_route_data(user_id, route_data)
         
         waypoints = database.get_route_waypoints(route_id, user_id)
@@ -222,4 +222,188 @@ class TestDatabaseFunctions:
             mock_conn.side_effect = psycopg2.Error("Connection failed")
             
             with pytest.raises(DatabaseError):
-                database.get_user_routes(1) 
\ No newline at end of file
+                database.get_user_routes(1)
+
+    def test_execute_values_builds_multi_row_statements(self):
+        """Test multi-row VALUES fallback used for non-psycopg2 cursors"""
+        cursor = Mock()
+        cursor.fetchall.return_value = [{'id': 1}]
+        rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+        
+        result = database._execute_values(
+            cursor, "INSERT INTO t (x, y) VALUES %s RETURNING id", rows, fetch=True, page_size=2
+        )
+        
+        assert cursor.execute.call_count == 2
+        first_query, first_params = cursor.execute.call_args_list[0][0]
+        assert "VALUES (%s, %s), (%s, %s) RETURNING id" in first_query
+        assert first_params == [1, 'a', 2, 'b']
+        assert result == [{'id': 1}, {'id': 1}]
+
+    def test_normalize_track_points_key_aliases(self):
+        """Test track point normalization handles GPX and API key styles"""
+        points = [
+            {'latitude': 40.0, 'longitude': -74.0, 'elevation': 100.0},
+            {'lat': 40.001, 'lon': -74.001, 'elevation': 105.0, 'distance': 0.1},
+            {'lat': 40.002, 'lon': -74.002, 'cumulativeDistance': 0.2}
+        ]
+        
+        assert database._normalize_track_points(points) == [
+            (40.0, -74.0, 100.0, 0),
+            (40.001, -74.001, 105.0, 0.1),
+            (40.002, -74.002, None, 0.2)
+        ]
+        
+        normalized = [(40.0, -74.0, 100.0, 0.0)]
+        assert database._normalize_track_points(normalized) is normalized
+
+    def test_normalize_track_points_key_precedence(self):
+        """Test uniform and mixed lists prefer the same key when a point carries both"""
+        uniform = [
+            {'lat': 40.0, 'lon': -74.0, 'elevation': 100.0, 'distance': 0.1, 'cumulativeDistance': 0.2},
+            {'lat': 40.001, 'lon': -74.001, 'elevation': 105.0, 'distance': 0.3, 'cumulativeDistance': 0.4}
+        ]
+        assert database._normalize_track_points(uniform) == [
+            (40.0, -74.0, 100.0, 0.2),
+            (40.001, -74.001, 105.0, 0.4)
+        ]
+        
+        mixed = [
+            {'lat': 40.0, 'lon': -74.0, 'elevation': 100.0, 'distance': 0.1},
+            {'lat': 40.001, 'lon': -74.001, 'elevation': 105.0, 'distance': 0.3, 'cumulativeDistance': 0.4}
+        ]
+        assert database._normalize_track_points(mixed) == [
+            (40.0, -74.0, 100.0, 0.1),
+            (40.001, -74.001, 105.0, 0.4)
+        ]
+
+    def test_noop_updates_skip_database(self):
+        """Test updates with no mapped fields return False without connecting"""
+        with patch('database.get_db_connection') as mock_conn:
+            assert database.update_route_data("1", {'unknown_field': 'x'}, 1) is False
+            assert database.update_waypoint(1, {}, 1) is False
+            mock_conn.assert_not_called()
+
+    def test_get_db_cursor_reuses_pooled_connection(self, mock_db_connect):
+        """Test sequential cursors share one pooled connection"""
+        with database.get_db_cursor():
+            pass
+        with database.get_db_cursor():
+            pass
+        
+        mock_db_connect.assert_called_once()
+        assert mock_db_connect.return_value.commit.call_count == 2
+        mock_db_connect.return_value.close.assert_not_called()
+        
+        database.close_db_connections()
+        mock_db_connect.return_value.close.assert_called_once()
+
+    def test_get_db_cursor_reopens_expired_connection(self, mock_db_connect):
+        """Test a pooled connection past its max age is closed and replaced"""
+        with patch('database.CONNECTION_MAX_AGE_SECONDS', 0):
+            with database.get_db_cursor():
+                pass
+            with database.get_db_cursor():
+                pass
+        
+        assert mock_db_connect.call_count == 2
+        mock_db_connect.return_value.close.assert_called_once()
+
+    def test_check_database_health_caches_counts(self, mock_db_connect):
+        """Test health check reuses recent counts but always probes the connection"""
+        database._health_stats_cache.update(checked_at=0.0, stats=None)
+        cursor = mock_db_connect.return_value.cursor.return_value
+        cursor.fetchone.return_value = {'user_count': 2, 'route_count': 5}
+        
+        first = database.check_database_health()
+        second = database.check_database_health()
+        
+        assert first['routes'] == second['routes'] == 5
+        assert cursor.execute.call_count == 3
+
+    def test_get_route_version(self, mock_db_connect):
+        """Test the route version is read alone and None when the route is not accessible"""
+        cursor = mock_db_connect.return_value.cursor.return_value
+        cursor.fetchone.return_value = {'updated_at': 'v1'}
+        
+        assert database.get_route_version(5, None) == 'v1'
+        assert cursor.execute.call_args[0][1] == (5, 0)
+        
+        cursor.fetchone.return_value = None
+        assert database.get_route_version(5, 1) is None
+
+    def test_get_db_cursor_fails_when_pool_exhausted(self, mock_db_connect):
+        """Test a checkout fails once every pooled connection is in use"""
+        with patch('database._pool_slots', database.threading.BoundedSemaphore(1)), \
+             patch('database.DATABASE_POOL_TIMEOUT', 0.01):
+            with database.get_db_cursor():
+                with pytest.raises(DatabaseError):
+                    with database.get_db_cursor():
+                        pass
+            with database.get_db_cursor():
+                pass
+        
+        mock_db_connect.assert_called_once()
+
+    def test_pipeline_cursor_reuses_pooled_connection(self):
+        """Test pipeline uploads share one pooled psycopg 3 connection"""
+        database.close_db_connections()
+        with patch('database._pipeline_supported', return_value=True), \
+             patch('database.psycopg.connect') as mock_connect:
+            mock_connect.return_value.closed = False
+            
+            with database.get_db_pipeline_cursor():
+                pass
+            with database.get_db_pipeline_cursor():
+                pass
+            
+            mock_connect.assert_called_once()
+            assert mock_connect.return_value.commit.call_count == 2
+            mock_connect.return_value.close.assert_not_called()
+            database.close_db_connections()
+
+    def test_prepared_statements_prepared_once_per_connection(self, mock_db_connect):
+        """Test hot statements are prepared on first use and then only executed"""
+        cursor = mock_db_connect.return_value.cursor.return_value
+        cursor.rowcount = 1
+        
+        assert database.delete_route("1", 1) is True
+        assert database.delete_route("2", 1) is True
+        
+        statements = [call[0][0] for call in cursor.execute.call_args_list]
+        assert statements[0].startswith("PREPARE delete_route AS")
+        assert statements[1:] == ["EXECUTE delete_route (%s, %s)"] * 2
+
+    def test_user_routes_refetched_after_waypoint_write(self, mock_db_connect):
+        """Test a waypoint change drops the cached route list, since it reorders the routes"""
+        database._user_routes_cache.clear()
+        cursor = mock_db_connect.return_value.cursor.return_value
+        cursor.fetchone.side_effect = [
+            {'routes': [{'id': '1'}, {'id': '2'}]},
+            {'routes': [{'id': '2'}, {'id': '1'}]}
+        ]
+        cursor.rowcount = 1
+        
+        with patch('database.USER_ROUTES_TTL_SECONDS', 30):
+            assert database.get_user_routes(1) == [{'id': '1'}, {'id': '2'}]
+            assert database.update_waypoint(7, {'name': 'Aid station'}, 1) is True
+            assert database.get_user_routes(1) == [{'id': '2'}, {'id': '1'}]
+
+    def test_user_routes_cached_until_route_deleted(self, mock_db_connect):
+        """Test the route list is served from cache and refetched after a delete"""
+        database._user_routes_cache.clear()
+        cursor = mock_db_connect.return_value.cursor.return_value
+        cursor.fetchone.return_value = {'routes': [{'id': '1'}]}
+        cursor.rowcount = 1
+        
+        with patch('database.USER_ROUTES_TTL_SECONDS', 30):
+            routes = database.get_user_routes(1)
+            routes[0]['id'] = 'changed'
+            routes.append({'id': '2'})
+            assert database.get_user_routes(1) == [{'id': '1'}]
+            assert cursor.execute.call_count == 1
+            
+            database.delete_route("1", 1)
+            cursor.execute.reset_mock()
+            database.get_user_routes(1)
+            assert cursor.execute.call_count == 1
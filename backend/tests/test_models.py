@@ -3,7 +3,8 @@ from pydantic import ValidationError
 
 from models import (
     Waypoint, TrackPoint, RouteData, RouteResponse, 
-    WaypointNotesUpdate, RouteListItem, RouteDetail
+    WaypointNotesUpdate, RouteListItem, RouteDetail, ApproveEmailRequest,
+    ApproveEmailsBulkRequest
 )
 
 
@@ -267,6 +268,30 @@ class TestModels:
         with pytest.raises(ValidationError):
             RouteData(**route_data)
 
+    def test_approve_email_request_model(self):
+        """Test approve-email payloads are checked as email addresses"""
+        request = ApproveEmailRequest(email="runner@example.com")
+        
+        assert request.email == "runner@example.com"
+        assert request.notes == ""
+        
+        with pytest.raises(ValidationError):
+            ApproveEmailRequest(email="not-an-email")
+
+    def test_approve_emails_bulk_request_model(self):
+        """Test bulk approvals accept plain addresses and objects but reject anything else"""
+        request = ApproveEmailsBulkRequest(emails=[
+            "runner@example.com",
+            {"email": "pacer@example.com", "notes": "crew"}
+        ])
+        
+        assert request.emails[0] == "runner@example.com"
+        assert request.emails[1].notes == "crew"
+        
+        for emails in ([], ["not-an-email"], [42], [{"notes": "no email"}]):
+            with pytest.raises(ValidationError):
+                ApproveEmailsBulkRequest(emails=emails)
+
     def test_model_serialization(self, sample_route_data):
         """Test model serialization to dict"""
         route_data = RouteData(**sample_route_data)
@@ -5,117 +5,154 @@ This module handles parsing of GPX XML files and converting them
 to the format expected by the database.
 """
 
+import hashlib
+import io
+import re
 import xml.etree.ElementTree as ET
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional, BinaryIO, Union
 import math
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Whole-second UTC/offset timestamps as written by most GPS devices. These are already in
+# the form datetime.isoformat() produces (once 'Z' becomes '+00:00'), so they skip parsing.
+# The pattern range-checks each field but not month lengths; the date part is checked separately.
+_CANONICAL_TIME_RE = re.compile(
+    r'\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d'
+    r'(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)'
+)
 
-def process_gpx_content(gpx_content: str, filename: str) -> Dict[str, Any]:
+
+def _normalize_gpx_time(time_text: str) -> Optional[str]:
+    """
+    Convert a GPX <time> value to an ISO 8601 string.
+    
+    Args:
+        time_text: Text content of the <time> element
+        
+    Returns:
+        ISO 8601 timestamp string or None if it cannot be parsed
+    """
+    if _CANONICAL_TIME_RE.fullmatch(time_text):
+        try:
+            date.fromisoformat(time_text[:10])
+        except ValueError:  # e.g. 2024-02-31
+            return None
+        # isoformat() writes UTC as '+00:00', whether the input said 'Z' or '-00:00'
+        if time_text.endswith(('Z', '-00:00')):
+            return time_text[:19] + '+00:00'
+        return time_text
+    
+    try:
+        # Parse ISO 8601 time format
+        return datetime.fromisoformat(time_text.replace('Z', '+00:00')).isoformat()
+    except ValueError:
+        # Try alternative time formats
+        for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%SZ']:
+            try:
+                return datetime.strptime(time_text.rstrip('Z'), fmt.rstrip('Z')).isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+class _HashingReader:
+    """File wrapper that feeds every chunk read by the parser into a SHA-256 digest."""
+    
+    def __init__(self, source: BinaryIO):
+        self._source = source
+        self.digest = hashlib.sha256()
+    
+    def read(self, size: int = -1) -> bytes:
+        data = self._source.read(size)
+        self.digest.update(data)
+        return data
+
+
+def _child_text(element: ET.Element, name: str) -> Optional[str]:
+    """Return the text of the first direct child whose local tag name is name."""
+    for child in element:
+        tag = child.tag
+        if tag == name or tag.endswith('}' + name):
+            return child.text
+    return None
+
+
+def process_gpx_content(gpx_content: Union[str, bytes, BinaryIO], filename: str) -> Dict[str, Any]:
     """
     Process GPX XML content and return route data in database format.
     
+    The document is parsed incrementally; each track point and waypoint element is
+    cleared once read, so a file-like source is never held in memory as a whole.
+    
     Args:
-        gpx_content: Raw GPX XML content as string
+        gpx_content: Raw GPX XML as a string or bytes, or a binary file object
         filename: Original filename for the route
         
     Returns:
         Dictionary containing route data in the format expected by the database
     """
     try:
-        # Parse XML
-        root = ET.fromstring(gpx_content)
-        
-        # Find namespace - handle default namespace properly
-        namespace = {'gpx': 'http://www.topografix.com/GPX/1/1'}  # Default GPX namespace
-        if root.tag.startswith('{'):
-            # Extract namespace from root tag
-            ns_uri = root.tag[1:].split('}')[0]
-            namespace = {'gpx': ns_uri}
+        # The file hash is computed from the same reads the parser makes, so the upload
+        # is only passed over once
+        if isinstance(gpx_content, str):
+            gpx_content = gpx_content.encode('utf-8')
+        if isinstance(gpx_content, bytes):
+            source = _HashingReader(io.BytesIO(gpx_content))
+        else:
+            source = _HashingReader(gpx_content)
         
         # Extract track points
         track_points = []
         waypoints = []
         
-        # Process tracks - try both with and without namespace
-        tracks = root.findall('.//gpx:trk', namespace)
-        if not tracks:
-            tracks = root.findall('.//trk')  # Fallback without namespace
+        # Elements are matched by local name so both namespaced and plain GPX files work.
+        # Processed points are detached from their parent, so the tree iterparse builds
+        # holds only the point being read rather than every point seen so far
+        parents = []
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            tag = element.tag
+            if tag[0] == '{':
+                tag = tag[tag.index('}') + 1:]
             
-        for track in tracks:
-            track_segments = track.findall('.//gpx:trkseg', namespace)
-            if not track_segments:
-                track_segments = track.findall('.//trkseg')
+            if tag == 'trkpt':
+                lat = float(element.get('lat', 0))
+                lon = float(element.get('lon', 0))
                 
-            for segment in track_segments:
-                points = segment.findall('.//gpx:trkpt', namespace)
-                if not points:
-                    points = segment.findall('.//trkpt')
+                ele_text = _child_text(element, 'ele')
+                elevation = float(ele_text) if ele_text else 0.0
                 
-                for point in points:
-                    lat = float(point.get('lat', 0))
-                    lon = float(point.get('lon', 0))
-                    
-                    # Extract elevation - try both namespace and no namespace
-                    ele_elem = point.find('gpx:ele', namespace)
-                    if ele_elem is None:
-                        ele_elem = point.find('ele')
-                    elevation = float(ele_elem.text) if ele_elem is not None and ele_elem.text else 0.0
-                    
-                    # Extract time - try both namespace and no namespace  
-                    time_elem = point.find('gpx:time', namespace)
-                    if time_elem is None:
-                        time_elem = point.find('time')
-                    time_str = None
-                    if time_elem is not None and time_elem.text:
-                        try:
-                            # Parse ISO 8601 time format
-                            time_str = datetime.fromisoformat(time_elem.text.replace('Z', '+00:00')).isoformat()
-                        except ValueError:
-                            # Try alternative time formats
-                            for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%SZ']:
-                                try:
-                                    time_str = datetime.strptime(time_elem.text.rstrip('Z'), fmt.rstrip('Z')).isoformat()
-                                    break
-                                except ValueError:
-                                    continue
-                    
-                    track_points.append({
-                        'latitude': lat,
-                        'longitude': lon,
-                        'elevation': elevation,
-                        'time': time_str
-                    })
-        
-        # Process waypoints - try both namespace and no namespace
-        wpt_elements = root.findall('.//gpx:wpt', namespace)
-        if not wpt_elements:
-            wpt_elements = root.findall('.//wpt')
-            
-        for wpt in wpt_elements:
-            lat = float(wpt.get('lat', 0))
-            lon = float(wpt.get('lon', 0))
-            
-            name_elem = wpt.find('gpx:name', namespace)
-            if name_elem is None:
-                name_elem = wpt.find('name')
-            name = name_elem.text if name_elem is not None else ''
-            
-            desc_elem = wpt.find('gpx:desc', namespace)
-            if desc_elem is None:
-                desc_elem = wpt.find('desc')
-            description = desc_elem.text if desc_elem is not None else ''
+                time_text = _child_text(element, 'time')
+                time_str = _normalize_gpx_time(time_text) if time_text else None
+                
+                track_points.append({
+                    'latitude': lat,
+                    'longitude': lon,
+                    'elevation': elevation,
+                    'time': time_str
+                })
+                if parents:
+                    parents[-1].remove(element)
             
-            waypoints.append({
-                'latitude': lat,
-                'longitude': lon,
-                'name': name,
-                'description': description,
-                'type': 'waypoint'
-            })
+            elif tag == 'wpt':
+                name = _child_text(element, 'name')
+                description = _child_text(element, 'desc')
+                
+                waypoints.append({
+                    'latitude': float(element.get('lat', 0)),
+                    'longitude': float(element.get('lon', 0)),
+                    'name': name if name is not None else '',
+                    'description': description if description is not None else '',
+                    'type': 'waypoint'
+                })
+                if parents:
+                    parents[-1].remove(element)
         
         if not track_points:
             raise ValueError("No track points found in GPX file")
@@ -143,7 +180,8 @@ def process_gpx_content(gpx_content: str, filename: str) -> Dict[str, Any]:
             'hasValidTime': has_valid_time,
             'startTime': start_time,
             'trackPoints': track_points,
-            'waypoints': waypoints
+            'waypoints': waypoints,
+            'fileHash': source.digest.hexdigest()
         }
         
         logger.info(f"Processed GPX file {filename}: {len(track_points)} track points, "